@@ -8,139 +8,185 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 # Now your existing imports will work
-from flask import Flask, request
-from flask_socketio import SocketIO, emit
-import json
-import threading
+from flask import Flask, Response, request
+from flask_socketio import SocketIO, emit, join_room
+from functools import partial
 import time
 from datetime import datetime
-import os
 
-from audio_processor import AudioProcessor
-from transcription import TranscriptionService
-from insights import InsightsGenerator  # Fixed import name
+import services
+from services import (
+    llm_client, create_audio_processor, create_insights_generator,
+    save_session, resolve_recording, insight_jobs, journals, save_journal, session_archive, register_metrics
+)
+from session_manager import SessionManager, SessionCapacityError
+import metrics
 from shared.config import Config
-
-# Initialize Groq client for insights
-from groq import Groq
-groq_client = Groq(api_key=Config.API_KEY)
+from shared.audio_protocol import (
+    BINARY_TRANSPORT, JSON_TRANSPORT, SEQ_MODULO, FrameError, decode_frame
+)
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Initialize services
-audio_processor = AudioProcessor()
-transcription_service = TranscriptionService()
-insights_generator = InsightsGenerator(groq_client, Config.MODEL_NAME)  # Pass Groq client
-
-# Global session state
-current_session = {
-    'active': False,
-    'start_time': None,
-    'transcript_parts': []
-}
-
-def save_session(session_data):
-    """Save session data to JSON file"""
-    try:
-        # Create data directory if it doesn't exist
-        data_dir = os.path.join(os.path.dirname(__file__), 'data', 'sessions')
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"session_{timestamp}.json"
-        filepath = os.path.join(data_dir, filename)
-        
-        # Save session data
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"✅ Session saved to {filepath}")
-        return filepath
-        
-    except Exception as e:
-        print(f"❌ Error saving session: {e}")
-        return None
+# One session per connected client (keyed by Socket.IO sid); the Whisper model,
+# worker pool and LLM client in services are shared by all of them
+session_manager = SessionManager(create_audio_processor, create_insights_generator, Config.MAX_SESSIONS)
+register_metrics(session_manager)
 
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    session_manager.connect(request.sid)
+    print(f'Client connected ({len(session_manager.sessions)} connected)')
     emit('status', {'message': 'Connected to server'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    session = session_manager.disconnect(request.sid)
+    if session and session.worker:
+        services.transcription_service.stop_transcription(session.worker, drain=False)
+    if session and session.journal:
+        # Keep what was recorded: the journal is compacted without insights
+        session.journal.append('session_end', session_ended=datetime.now().isoformat(), reason='disconnected')
+        socketio.start_background_task(save_journal, session.journal)
+        session.journal = None
     print('Client disconnected')
 
+@socketio.on('negotiate_transport')
+def handle_negotiate_transport(data):
+    """Pick the audio transport: binary frames if the client offers them, else JSON"""
+    offered = (data or {}).get('transports', [])
+    transport = BINARY_TRANSPORT if BINARY_TRANSPORT in offered else JSON_TRANSPORT
+    session_manager.connect(request.sid).transport = {'transport': transport, 'next_seq': None}
+    print(f"Audio transport for {request.sid}: {transport}")
+    emit('transport_selected', {
+        'transport': transport,
+        'sample_rate': Config.AUDIO_SAMPLE_RATE
+    })
+
 @socketio.on('start_session')
 def handle_start_session():
     """Start a new transcription session"""
-    global current_session
-    
-    current_session['active'] = True
-    current_session['start_time'] = datetime.now()
-    current_session['transcript_parts'] = []
+    session = session_manager.connect(request.sid)
+    if session.worker:
+        # Restarted without a stop: finish the previous recording's audio (into the
+        # previous journal) before the shared audio processor is cleared and reused
+        worker, session.worker = session.worker, None
+        services.transcription_service.stop_transcription(worker)
+    try:
+        session_manager.start(session)
+    except SessionCapacityError as e:
+        print(f"⚠️ Rejected session start: {e}")
+        emit('session_error', {'error': str(e)})
+        return
     
     # Clear previous data
-    audio_processor.clear_buffer()
-    insights_generator.clear_buffer()  # Fixed method name
+    session.audio_processor.clear_buffer()
+    session.insights_generator.clear_buffer()  # Fixed method name
+    
+    if session.journal:
+        # Restarted without a stop: close out the previous recording
+        socketio.start_background_task(save_journal, session.journal)
+    session.journal = journals.open(session.id, session_started=session.start_time.isoformat())
     
     # Start continuous transcription
-    transcription_service.start_continuous_transcription(
-        audio_processor, 
-        handle_new_transcript
+    session.worker = services.transcription_service.start_continuous_transcription(
+        session.audio_processor,
+        partial(handle_new_transcript, session),
+        on_backpressure=partial(handle_backpressure, session)
     )
     
-    print("Session started")
+    print(f"Session started ({session_manager.active_count()} active)")
     emit('session_started', {'message': 'Session started successfully'})
 
 @socketio.on('stop_session')
 def handle_stop_session():
-    """Handle session stop and generate final insights"""
-    if not current_session['active']:
+    """Stop capture now; final insights are generated by a background job"""
+    session = session_manager.get(request.sid)
+    if not session or not session.active:
         return
     
     try:
-        current_session['active'] = False
+        # Stop transcription first: the window in progress is finished and words
+        # held back for overlap agreement are flushed into the transcript
+        worker, session.worker = session.worker, None
+        if worker:
+            services.transcription_service.stop_transcription(worker)
+        
+        session.active = False
         
-        # Generate comprehensive insights from entire session
+        # The job owns this session's journal and generator, so the client may
+        # start recording again while insights are still being generated
+        journal, session.journal = session.journal, None
+        journal.append('session_end', session_ended=datetime.now().isoformat(),
+                       transcription_stats=services.transcription_service.get_stats(worker) if worker else None)
+        job = insight_jobs.create(session.id)
+        join_room(job.room)
+        # Tell the client the job id before the job can report on it
+        emit('session_stopped', {'message': 'Session ended successfully', 'job_id': job.id})
+        emit('insights_progress', job.to_dict())
+        insight_jobs.submit(job, run_insights_job, session.take_insights_generator(), journal)
+        
+    except Exception as e:
+        print(f"Error stopping session: {e}")
+
+def run_insights_job(job, generator, journal):
+    """Background job: generate final insights, compact the session journal, push the result"""
+    def progress(stage):
+        insight_jobs.update(job, stage)
+        socketio.emit('insights_progress', job.to_dict(), to=job.room)
+    
+    try:
         print("🧠 Generating final session insights...")
-        final_insights = insights_generator.generate_final_insights()
+        progress('starting')
+        # Tokens are streamed to the client as they arrive; final_insights carries the parsed result
+        final_insights = generator.generate_final_insights(
+            on_delta=lambda delta: socketio.emit('final_insights_delta', {'delta': delta, 'job_id': job.id},
+                                                 to=job.room),
+            on_progress=progress
+        )
+        progress('saving')
+        journal.append('insights', insights=final_insights)
+        save_journal(journal)
+        insight_jobs.finish(job, final_insights)
         
         if final_insights:
-            socketio.emit('final_insights', final_insights)
+            socketio.emit('final_insights', {**final_insights, 'job_id': job.id}, to=job.room)
             print(f"✅ Sent final insights to frontend: {len(final_insights.get('insights', []))} insights")
-        
-        # Save session
-        session_data = {
-            'transcript_parts': current_session['transcript_parts'],
-            'insights': final_insights,
-            'session_ended': datetime.now().isoformat()
-        }
-        
-        save_session(session_data)
-        socketio.emit('session_stopped', {'message': 'Session ended successfully'})
-        
-        # Stop transcription
-        if transcription_service:
-            transcription_service.stop_transcription()
-        
     except Exception as e:
-        print(f"Error stopping session: {e}")
+        print(f"❌ Insight job {job.id} failed: {e}")
+        insight_jobs.fail(job, e)
+        # The journal stays on disk and is recovered at the next startup
+    socketio.emit('insights_progress', job.to_dict(), to=job.room)
+
+@socketio.on('get_insights_job')
+def handle_get_insights_job(data):
+    """Re-fetch an insight job by id (e.g. after a reconnect) and follow it if still running"""
+    job_id = (data or {}).get('job_id', '')
+    job = insight_jobs.get(job_id)
+    if job is None:
+        emit('insights_progress', {'job_id': job_id, 'status': 'unknown', 'error': 'No such insight job'})
+        return
+    
+    join_room(job.room)
+    emit('insights_progress', job.to_dict())
+    if job.status == 'done' and job.result:
+        emit('final_insights', {**job.result, 'job_id': job.id})
 
 @socketio.on('audio_data')
 def handle_audio_data(data):
     """Handle incoming audio data"""
-    if not current_session['active']:
+    session = session_manager.get(request.sid)
+    if not session or not session.active:
         return
     
     try:
         audio_chunk = data.get('audio')
         if audio_chunk:
             # Process the audio chunk
-            processed_audio = audio_processor.process_audio_chunk(audio_chunk)
+            processed_audio = session.audio_processor.process_audio_chunk(audio_chunk)
             
             if processed_audio is not None:
                 # Audio processed successfully
@@ -150,26 +196,100 @@ def handle_audio_data(data):
         print(f"Error handling audio data: {e}")
         emit('audio_error', {'error': str(e)})
 
-def handle_new_transcript(text):
-    """Handle new transcript text"""
-    if not current_session['active']:
+@socketio.on('audio_frame')
+def handle_audio_frame(data):
+    """Handle a binary audio frame (one or more coalesced PCM blocks)"""
+    session = session_manager.get(request.sid)
+    if not session or not session.active:
         return
+    audio_processor = session.audio_processor
     
     try:
-        # Add to session transcript
-        current_session['transcript_parts'].append({
-            'text': text,
-            'timestamp': datetime.now().isoformat()
+        started = time.perf_counter()
+        frame = decode_frame(data)
+        metrics.AUDIO_CHUNK_SECONDS.labels('decode').observe(time.perf_counter() - started)
+        if frame.sample_rate != audio_processor.sample_rate:
+            raise FrameError(
+                f"sample rate {frame.sample_rate} does not match server rate {audio_processor.sample_rate}"
+            )
+        
+        # Detect lost or reordered frames from the block sequence numbers
+        if session.transport is None:
+            session.transport = {'transport': BINARY_TRANSPORT, 'next_seq': None}
+        state = session.transport
+        if state['next_seq'] is not None and frame.seq != state['next_seq']:
+            print(f"⚠️ Audio sequence gap: expected {state['next_seq']}, got {frame.seq}")
+        state['next_seq'] = (frame.seq + len(frame.blocks)) % SEQ_MODULO
+        
+        audio_processor.process_pcm_blocks(frame.blocks)
+        emit('audio_received', {'status': 'ok', 'seq': frame.seq})
+        
+    except Exception as e:
+        print(f"Error handling audio frame: {e}")
+        emit('audio_error', {'error': str(e)})
+
+@socketio.on('transcribe_file')
+def handle_transcribe_file(data):
+    """Transcribe a recording from BATCH_AUDIO_DIR offline, then generate insights"""
+    name = (data or {}).get('path', '')
+    path = resolve_recording(name)
+    if path is None:
+        emit('batch_error', {'path': name, 'error': f"No recording named '{name}' in {Config.BATCH_AUDIO_DIR}"})
+        return
+    
+    socketio.start_background_task(run_file_transcription, path, name, request.sid)
+    emit('batch_started', {'path': name})
+
+def run_file_transcription(path, name, sid):
+    """Background task: batch-transcribe a file and feed the insights path"""
+    try:
+        result = services.transcription_service.transcribe_file(
+            path,
+            progress_callback=lambda progress: socketio.emit('batch_progress', {'path': name, **progress}, to=sid)
+        )
+        socketio.emit('batch_transcript', {'path': name, **result}, to=sid)
+        
+        # Same insights path as a live session, with its own transcript buffer
+        generator = create_insights_generator()
+        for segment in result['segments']:
+            generator.update_transcript(segment['text'])
+        print("🧠 Generating insights for recording...")
+        final_insights = generator.generate_final_insights(
+            on_delta=lambda delta: socketio.emit('final_insights_delta', {'delta': delta}, to=sid)
+        )
+        if final_insights:
+            socketio.emit('final_insights', final_insights, to=sid)
+        
+        save_session({
+            'source_file': name,
+            'transcript_parts': result['segments'],
+            'insights': final_insights,
+            'transcription_stats': {key: value for key, value in result.items()
+                                    if key not in ('text', 'segments')},
+            'session_ended': datetime.now().isoformat()
         })
         
+    except Exception as e:
+        print(f"❌ Error transcribing {name}: {e}")
+        socketio.emit('batch_error', {'path': name, 'error': str(e)}, to=sid)
+
+def handle_new_transcript(session, text):
+    """Handle new transcript text for one session"""
+    if not session.active:
+        return
+    
+    try:
+        # Add to session transcript (and its journal, so a crash loses at most a second of it)
+        part = {'text': text, 'timestamp': datetime.now().isoformat()}
+        session.transcript_parts.append(part)
+        if session.journal:
+            session.journal.append('transcript', **part)
+        
         # Update insights generator (accumulate transcript only)
-        insights_generator.update_transcript(text)
+        session.insights_generator.update_transcript(text)
         
-        # Send transcript to frontend
-        socketio.emit('new_transcript', {
-            'text': text,
-            'timestamp': datetime.now().isoformat()
-        })
+        # Send transcript to this session's client only
+        socketio.emit('new_transcript', part, to=session.room)
         
         print(f"✅ Sent transcript to frontend: {text[:50]}...")
         
@@ -178,18 +298,68 @@ def handle_new_transcript(text):
     except Exception as e:
         print(f"❌ Error handling transcript: {e}")
 
+def handle_backpressure(session, info):
+    """Tell the client that transcription is behind and audio was dropped"""
+    if session.journal:
+        session.journal.append('backpressure', **info)
+    socketio.emit('backpressure', info, to=session.room)
+
+@socketio.on('search_sessions')
+def handle_search_sessions(data):
+    """Ranked full-text search over saved sessions: {q, start, end, limit, offset}"""
+    data = data or {}
+    try:
+        emit('search_results', session_archive.search(
+            data.get('q', ''), data.get('start'), data.get('end'), data.get('limit', 20), data.get('offset', 0)))
+    except ValueError as e:
+        emit('search_results', {'query': data.get('q', ''), 'error': str(e), 'total': 0, 'results': []})
+
+@app.route('/sessions/search')
+def search_sessions():
+    args = request.args
+    try:
+        return session_archive.search(
+            args.get('q', ''), args.get('start'), args.get('end'), args.get('limit', 20), args.get('offset', 0))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+@app.route('/insights/<job_id>')
+def get_insights_job(job_id):
+    job = insight_jobs.get(job_id)
+    if job is None:
+        return {'error': 'No such insight job', 'job_id': job_id}, 404
+    return job.to_dict(include_result=True)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage latencies, queue depths and session counts in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/health')
 def health_check():
-    return {'status': 'healthy', 'timestamp': datetime.now().isoformat()}
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'sessions': session_manager.get_stats(),
+        'insight_jobs': insight_jobs.get_stats(),
+        'journal': journals.get_stats(),
+        'archive': session_archive.get_stats(),
+        'transcription': [services.transcription_service.get_stats(session.worker)
+                          for session in list(session_manager.sessions.values()) if session.worker],
+        'llm': llm_client.get_metrics()
+    }
 
 if __name__ == '__main__':
     print("Starting Audio Insights Backend...")
     print(f"Groq URL: {Config.API_BASE_URL}")
     print(f"Model: {Config.MODEL_NAME}")
+    services.init()
     
+    # No reloader: it would run the startup work (model load, recovery) in a second process
     socketio.run(
         app, 
         host=Config.FLASK_HOST, 
         port=Config.FLASK_PORT, 
-        debug=True
+        debug=True,
+        use_reloader=False
     )
@@ -0,0 +1,503 @@
+import sys
+import os
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+# Asyncio entry point: the same events as app.py on socketio.AsyncServer.
+# Run from backend/ with:  uvicorn asgi_app:app --host localhost --port 5000
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs
+
+import socketio
+
+import services
+from services import (
+    llm_client, create_audio_processor, create_insights_generator,
+    save_session, resolve_recording, insight_jobs, journals, save_journal, session_archive, register_metrics
+)
+from session_manager import SessionManager, SessionCapacityError
+import metrics
+from shared.config import Config
+from shared.audio_protocol import (
+    BINARY_TRANSPORT, JSON_TRANSPORT, SEQ_MODULO, FrameError, decode_frame
+)
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins="*")
+
+# One session per connected client (keyed by Socket.IO sid); the Whisper model,
+# worker pool and LLM client in services are shared by all of them
+session_manager = SessionManager(create_audio_processor, create_insights_generator, Config.MAX_SESSIONS)
+
+# Blocking work never runs on the event loop: filtering and ring-buffer writes go to
+# the ingest threads, Whisper calls to the inference threads (which mostly wait on
+# the worker pool when WHISPER_WORKERS is set)
+ingest_executor = ThreadPoolExecutor(max_workers=Config.ASYNC_INGEST_THREADS, thread_name_prefix='ingest')
+inference_executor = ThreadPoolExecutor(
+    max_workers=Config.ASYNC_INFERENCE_THREADS or max(2, 2 * Config.WHISPER_WORKERS),
+    thread_name_prefix='inference'
+)
+
+# At most INSIGHT_JOB_WORKERS insight jobs talk to the LLM at once; the rest wait queued
+# (created in on_startup, on the server's event loop)
+insight_job_slots = None
+
+# Event-loop responsiveness, sampled by monitor_loop_lag (seconds)
+loop_lag = {'last': 0.0, 'max': 0.0}
+
+register_metrics(session_manager, lambda: {
+    'ingest_frames': sum(session.pipeline.frames.qsize()
+                         for session in list(session_manager.sessions.values()) if session.pipeline)
+})
+metrics.EVENT_LOOP_LAG.set_function(lambda: loop_lag['last'])
+
+
+class AudioPipeline:
+    """Coroutines that move one session's audio from the socket to Whisper.
+
+    Event handlers queue frames; ``ingest`` writes them to the AudioProcessor
+    in arrival order on the ingest executor and flags full windows, and
+    ``dispatch`` hands each window to the session's TranscriptionWorker on the
+    inference executor. No thread is parked per session, so a waiting session
+    costs only its buffers.
+    """
+
+    def __init__(self, session, max_queued_frames=64):
+        self.session = session
+        self.loop = asyncio.get_running_loop()
+        self.frames = asyncio.Queue(maxsize=max_queued_frames)
+        self.window_ready = asyncio.Event()
+        self.frames_dropped = 0
+        self.stopping = False
+        self.deliveries = set()  # transcripts handed to the event loop, not yet handled
+        self.worker = services.transcription_service.create_worker(
+            session.audio_processor,
+            self.transcript_from_thread,
+            on_backpressure=self.backpressure_from_thread
+        )
+        self.ingest_task = self.loop.create_task(self.ingest())
+        self.dispatch_task = self.loop.create_task(self.dispatch())
+
+    def put(self, kind, payload):
+        """Queue audio from an event handler; if ingest is behind, the oldest frame is dropped"""
+        if self.frames.full():
+            self.frames.get_nowait()
+            self.frames_dropped += 1
+        self.frames.put_nowait((kind, payload))
+
+    async def ingest(self):
+        processor = self.session.audio_processor
+        while True:
+            item = await self.frames.get()
+            if item is None:
+                break
+            kind, payload = item
+            process = processor.process_pcm_blocks if kind == 'pcm' else processor.process_audio_chunk
+            try:
+                await self.loop.run_in_executor(ingest_executor, process, payload)
+            except Exception as e:
+                print(f"Error handling audio: {e}")
+                await sio.emit('audio_error', {'error': str(e)}, to=self.session.room)
+                continue
+            if processor.pending_windows():
+                self.window_ready.set()
+
+    async def dispatch(self):
+        processor = self.session.audio_processor
+        while not self.stopping:
+            window = processor.next_window()
+            if window is None:
+                self.window_ready.clear()
+                await self.window_ready.wait()
+                continue
+            try:
+                await self.loop.run_in_executor(inference_executor, self.worker.process_available, window)
+            except Exception as e:
+                print(f"Transcription worker error: {e}")
+        # Stopping: queued windows, the partial last window and held-back words
+        await self.loop.run_in_executor(inference_executor, self.worker.drain)
+
+    async def close(self):
+        """Write the queued audio, transcribe everything buffered and flush held-back words"""
+        await self.frames.put(None)
+        await self.ingest_task
+        self.stopping = True
+        self.window_ready.set()
+        await self.dispatch_task
+        # The last transcripts reach the session (and its journal) before the caller moves on
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in list(self.deliveries)))
+        services.transcription_service.stop_transcription(self.worker)
+
+    def cancel(self):
+        """Abandon the session's audio (client gone); an inference call in flight is discarded"""
+        self.ingest_task.cancel()
+        self.dispatch_task.cancel()
+        services.transcription_service.stop_transcription(self.worker, drain=False)
+
+    def transcript_from_thread(self, text):
+        future = asyncio.run_coroutine_threadsafe(handle_new_transcript(self.session, text), self.loop)
+        self.deliveries.add(future)
+        future.add_done_callback(self.deliveries.discard)
+
+    def backpressure_from_thread(self, info):
+        if self.session.journal:
+            self.session.journal.append('backpressure', **info)
+        asyncio.run_coroutine_threadsafe(sio.emit('backpressure', info, to=self.session.room), self.loop)
+
+    def get_stats(self):
+        return {'queued_frames': self.frames.qsize(), 'frames_dropped': self.frames_dropped}
+
+
+@sio.event
+async def connect(sid, environ):
+    session_manager.connect(sid)
+    print(f'Client connected ({len(session_manager.sessions)} connected)')
+    await sio.emit('status', {'message': 'Connected to server'}, to=sid)
+
+
+@sio.event
+async def disconnect(sid):
+    session = session_manager.disconnect(sid)
+    if session and session.pipeline:
+        session.pipeline.cancel()
+        session.pipeline = None
+    if session and session.journal:
+        # Keep what was recorded: the journal is compacted without insights
+        session.journal.append('session_end', session_ended=datetime.now().isoformat(), reason='disconnected')
+        asyncio.get_running_loop().run_in_executor(None, save_journal, session.journal)
+        session.journal = None
+    print('Client disconnected')
+
+
+@sio.event
+async def negotiate_transport(sid, data):
+    """Pick the audio transport: binary frames if the client offers them, else JSON"""
+    offered = (data or {}).get('transports', [])
+    transport = BINARY_TRANSPORT if BINARY_TRANSPORT in offered else JSON_TRANSPORT
+    session_manager.connect(sid).transport = {'transport': transport, 'next_seq': None}
+    print(f"Audio transport for {sid}: {transport}")
+    await sio.emit('transport_selected', {
+        'transport': transport,
+        'sample_rate': Config.AUDIO_SAMPLE_RATE
+    }, to=sid)
+
+
+@sio.event
+async def start_session(sid):
+    """Start a new transcription session"""
+    session = session_manager.connect(sid)
+    if session.pipeline:
+        # Restarted without a stop: let the previous recording's inference finish with
+        # the shared audio processor (and reach the previous journal) before reusing it
+        pipeline, session.pipeline = session.pipeline, None
+        await pipeline.close()
+    try:
+        session_manager.start(session)
+    except SessionCapacityError as e:
+        print(f"⚠️ Rejected session start: {e}")
+        await sio.emit('session_error', {'error': str(e)}, to=sid)
+        return
+
+    session.audio_processor.clear_buffer()
+    session.insights_generator.clear_buffer()
+    if session.journal:
+        # Restarted without a stop: close out the previous recording
+        asyncio.get_running_loop().run_in_executor(None, save_journal, session.journal)
+    session.journal = journals.open(session.id, session_started=session.start_time.isoformat())
+    session.pipeline = AudioPipeline(session, Config.ASYNC_INGEST_QUEUE_FRAMES)
+
+    print(f"Session started ({session_manager.active_count()} active)")
+    await sio.emit('session_started', {'message': 'Session started successfully'}, to=sid)
+
+
+@sio.event
+async def stop_session(sid):
+    """Stop capture now; final insights are generated by a background job"""
+    session = session_manager.get(sid)
+    if not session or not session.active:
+        return
+
+    try:
+        # Transcribe what is already buffered first so the last words reach the transcript
+        pipeline, session.pipeline = session.pipeline, None
+        if pipeline:
+            await pipeline.close()
+        session.active = False
+
+        # The job owns this session's journal and generator, so the client may
+        # start recording again while insights are still being generated
+        journal, session.journal = session.journal, None
+        journal.append('session_end', session_ended=datetime.now().isoformat(),
+                       transcription_stats=services.transcription_service.get_stats(pipeline.worker) if pipeline else None)
+        job = insight_jobs.create(session.id)
+        sio.enter_room(sid, job.room)
+        # Tell the client the job id before the job can report on it
+        await sio.emit('session_stopped', {'message': 'Session ended successfully', 'job_id': job.id}, to=sid)
+        await sio.emit('insights_progress', job.to_dict(), to=sid)
+        sio.start_background_task(run_insights_job, job, session.take_insights_generator(), journal)
+
+    except Exception as e:
+        print(f"Error stopping session: {e}")
+
+
+async def run_insights_job(job, generator, journal):
+    """Background task: generate final insights, compact the session journal, push the result"""
+    async def progress(stage):
+        insight_jobs.update(job, stage)
+        await sio.emit('insights_progress', job.to_dict(), to=job.room)
+
+    try:
+        async with insight_job_slots:
+            print("🧠 Generating final session insights...")
+            await progress('starting')
+            final_insights = await generator.agenerate_final_insights(
+                on_delta=lambda delta: sio.emit('final_insights_delta', {'delta': delta, 'job_id': job.id},
+                                                to=job.room),
+                on_progress=progress
+            )
+            await progress('saving')
+            journal.append('insights', insights=final_insights)
+            await asyncio.get_running_loop().run_in_executor(None, save_journal, journal)
+        insight_jobs.finish(job, final_insights)
+
+        if final_insights:
+            await sio.emit('final_insights', {**final_insights, 'job_id': job.id}, to=job.room)
+            print(f"✅ Sent final insights to frontend: {len(final_insights.get('insights', []))} insights")
+    except Exception as e:
+        print(f"❌ Insight job {job.id} failed: {e}")
+        insight_jobs.fail(job, e)
+        # The journal stays on disk and is recovered at the next startup
+    await sio.emit('insights_progress', job.to_dict(), to=job.room)
+
+
+@sio.event
+async def get_insights_job(sid, data):
+    """Re-fetch an insight job by id (e.g. after a reconnect) and follow it if still running"""
+    job_id = (data or {}).get('job_id', '')
+    job = insight_jobs.get(job_id)
+    if job is None:
+        await sio.emit('insights_progress', {'job_id': job_id, 'status': 'unknown', 'error': 'No such insight job'},
+                       to=sid)
+        return
+
+    sio.enter_room(sid, job.room)
+    await sio.emit('insights_progress', job.to_dict(), to=sid)
+    if job.status == 'done' and job.result:
+        await sio.emit('final_insights', {**job.result, 'job_id': job.id}, to=sid)
+
+
+@sio.event
+async def audio_data(sid, data):
+    """Handle incoming audio data (JSON transport)"""
+    session = session_manager.get(sid)
+    if not session or not session.active or not session.pipeline:
+        return
+
+    audio_chunk = (data or {}).get('audio')
+    if audio_chunk:
+        session.pipeline.put('json', audio_chunk)
+        await sio.emit('audio_received', {'status': 'ok'}, to=sid)
+
+
+@sio.event
+async def audio_frame(sid, data):
+    """Handle a binary audio frame (one or more coalesced PCM blocks)"""
+    session = session_manager.get(sid)
+    if not session or not session.active or not session.pipeline:
+        return
+
+    try:
+        started = time.perf_counter()
+        frame = decode_frame(data)
+        metrics.AUDIO_CHUNK_SECONDS.labels('decode').observe(time.perf_counter() - started)
+        if frame.sample_rate != Config.AUDIO_SAMPLE_RATE:
+            raise FrameError(
+                f"sample rate {frame.sample_rate} does not match server rate {Config.AUDIO_SAMPLE_RATE}"
+            )
+
+        # Detect lost or reordered frames from the block sequence numbers
+        if session.transport is None:
+            session.transport = {'transport': BINARY_TRANSPORT, 'next_seq': None}
+        state = session.transport
+        if state['next_seq'] is not None and frame.seq != state['next_seq']:
+            print(f"⚠️ Audio sequence gap: expected {state['next_seq']}, got {frame.seq}")
+        state['next_seq'] = (frame.seq + len(frame.blocks)) % SEQ_MODULO
+
+        session.pipeline.put('pcm', frame.blocks)
+        await sio.emit('audio_received', {'status': 'ok', 'seq': frame.seq}, to=sid)
+
+    except Exception as e:
+        print(f"Error handling audio frame: {e}")
+        await sio.emit('audio_error', {'error': str(e)}, to=sid)
+
+
+@sio.event
+async def transcribe_file(sid, data):
+    """Transcribe a recording from BATCH_AUDIO_DIR offline, then generate insights"""
+    name = (data or {}).get('path', '')
+    path = resolve_recording(name)
+    if path is None:
+        await sio.emit('batch_error', {'path': name, 'error': f"No recording named '{name}' in {Config.BATCH_AUDIO_DIR}"}, to=sid)
+        return
+
+    sio.start_background_task(run_file_transcription, path, name, sid)
+    await sio.emit('batch_started', {'path': name}, to=sid)
+
+
+@sio.event
+async def search_sessions(sid, data):
+    """Ranked full-text search over saved sessions: {q, start, end, limit, offset}"""
+    data = data or {}
+    try:
+        results = await asyncio.get_running_loop().run_in_executor(None, lambda: session_archive.search(
+            data.get('q', ''), data.get('start'), data.get('end'), data.get('limit', 20), data.get('offset', 0)))
+    except ValueError as e:
+        results = {'query': data.get('q', ''), 'error': str(e), 'total': 0, 'results': []}
+    await sio.emit('search_results', results, to=sid)
+
+
+async def run_file_transcription(path, name, sid):
+    """Background task: batch-transcribe a file and feed the insights path"""
+    loop = asyncio.get_running_loop()
+
+    def progress(progress):
+        asyncio.run_coroutine_threadsafe(sio.emit('batch_progress', {'path': name, **progress}, to=sid), loop)
+
+    try:
+        # The whole file is one long blocking call; the default executor keeps it
+        # off the inference threads that serve live sessions
+        result = await loop.run_in_executor(None, lambda: services.transcription_service.transcribe_file(
+            path, progress_callback=progress))
+        await sio.emit('batch_transcript', {'path': name, **result}, to=sid)
+
+        generator = create_insights_generator()
+        for segment in result['segments']:
+            generator.update_transcript(segment['text'])
+        print("🧠 Generating insights for recording...")
+        final_insights = await generator.agenerate_final_insights(
+            on_delta=lambda delta: sio.emit('final_insights_delta', {'delta': delta}, to=sid)
+        )
+        if final_insights:
+            await sio.emit('final_insights', final_insights, to=sid)
+
+        await loop.run_in_executor(None, save_session, {
+            'source_file': name,
+            'transcript_parts': result['segments'],
+            'insights': final_insights,
+            'transcription_stats': {key: value for key, value in result.items()
+                                    if key not in ('text', 'segments')},
+            'session_ended': datetime.now().isoformat()
+        })
+
+    except Exception as e:
+        print(f"❌ Error transcribing {name}: {e}")
+        await sio.emit('batch_error', {'path': name, 'error': str(e)}, to=sid)
+
+
+async def handle_new_transcript(session, text):
+    """Handle new transcript text for one session (runs on the event loop)"""
+    if not session.active:
+        return
+
+    try:
+        # Journal appends only fill the file buffer; fsync happens on the journal's flusher thread
+        part = {'text': text, 'timestamp': datetime.now().isoformat()}
+        session.transcript_parts.append(part)
+        if session.journal:
+            session.journal.append('transcript', **part)
+        # Only appends; rolling summaries run on the generator's own thread
+        session.insights_generator.update_transcript(text)
+        await sio.emit('new_transcript', part, to=session.room)
+
+    except Exception as e:
+        print(f"❌ Error handling transcript: {e}")
+
+
+def health_check():
+    sessions = list(session_manager.sessions.values())
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'sessions': session_manager.get_stats(),
+        'insight_jobs': insight_jobs.get_stats(),
+        'journal': journals.get_stats(),
+        'archive': session_archive.get_stats(),
+        'event_loop_lag_ms': {name: round(value * 1000, 1) for name, value in loop_lag.items()},
+        'pipelines': [session.pipeline.get_stats() for session in sessions if session.pipeline],
+        'transcription': [services.transcription_service.get_stats(session.pipeline.worker)
+                          for session in sessions if session.pipeline],
+        'llm': llm_client.get_metrics()
+    }
+
+
+async def http_app(scope, receive, send):
+    """Plain HTTP routes served next to Socket.IO"""
+    if scope['type'] != 'http':
+        return
+    content_type = b'application/json'
+    if scope['path'] == '/health':
+        status, body = 200, json.dumps(health_check(), default=str).encode('utf-8')
+    elif scope['path'] == '/metrics':
+        status, body = 200, metrics.REGISTRY.render().encode('utf-8')
+        content_type = metrics.CONTENT_TYPE.encode('ascii')
+    elif scope['path'] == '/sessions/search':
+        args = {name: values[-1] for name, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, lambda: session_archive.search(
+                args.get('q', ''), args.get('start'), args.get('end'), args.get('limit', 20), args.get('offset', 0)))
+            status, body = 200, json.dumps(results).encode('utf-8')
+        except ValueError as e:
+            status, body = 400, json.dumps({'error': str(e)}).encode('utf-8')
+    elif scope['path'].startswith('/insights/'):
+        job = insight_jobs.get(scope['path'][len('/insights/'):])
+        if job is None:
+            status, body = 404, b'{"error": "No such insight job"}'
+        else:
+            status, body = 200, json.dumps(job.to_dict(include_result=True), default=str).encode('utf-8')
+    else:
+        status, body = 404, b'{"error": "not found"}'
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type)]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Measure how late the event loop wakes a sleeping task (blocked loop = high lag)"""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.monotonic() - started - interval)
+        loop_lag['last'] = lag
+        loop_lag['max'] = max(loop_lag['max'], lag)
+
+
+async def on_startup():
+    global insight_job_slots
+    # Before serving, on the main thread: the Whisper worker pool may fork from it
+    services.init()
+    insight_job_slots = asyncio.Semaphore(Config.INSIGHT_JOB_WORKERS)
+    sio.start_background_task(monitor_loop_lag)
+
+
+def on_shutdown():
+    services.transcription_service.shutdown()
+    insight_jobs.shutdown()
+    ingest_executor.shutdown(wait=False)
+    inference_executor.shutdown(wait=False)
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=on_startup, on_shutdown=on_shutdown)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("Starting Audio Insights Backend (asyncio)...")
+    print(f"Model: {Config.MODEL_NAME}")
+    uvicorn.run(app, host=Config.FLASK_HOST, port=Config.FLASK_PORT, log_level="warning")
@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity float32 ring buffer for streaming audio.
+
+    Samples are written twice (at ``i`` and ``i + capacity``) into a backing
+    array of ``2 * capacity`` so that any run of up to ``capacity`` samples is
+    one contiguous slice. Windowed reads therefore return NumPy views with no
+    copying, and memory use never grows past the preallocated array.
+
+    When a write would exceed the capacity, the oldest samples are discarded
+    and counted in ``dropped_samples``.
+    """
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        self._start = 0          # index of oldest sample, always < capacity
+        self._size = 0           # number of readable samples
+        self.total_written = 0   # samples written since last clear
+        self.dropped_samples = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        """Bytes held by the backing array (constant for the buffer's lifetime)"""
+        return self._data.nbytes
+
+    @property
+    def start_sample(self):
+        """Absolute index (since last clear) of the oldest readable sample"""
+        return self.total_written - self._size
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones if the buffer is full"""
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        with self.lock:
+            n = len(samples)
+            if n == 0:
+                return 0
+            if n > self.capacity:
+                # Only the newest `capacity` samples can ever be read back
+                self.dropped_samples += n - self.capacity
+                self.total_written += n - self.capacity
+                samples = samples[-self.capacity:]
+                n = self.capacity
+
+            overflow = self._size + n - self.capacity
+            if overflow > 0:
+                self._advance(overflow)
+                self.dropped_samples += overflow
+
+            pos = (self._start + self._size) % self.capacity
+            first = min(n, self.capacity - pos)
+            self._data[pos:pos + first] = samples[:first]
+            self._data[pos + self.capacity:pos + self.capacity + first] = samples[:first]
+            if first < n:
+                rest = n - first
+                self._data[:rest] = samples[first:]
+                self._data[self.capacity:self.capacity + rest] = samples[first:]
+
+            self._size += n
+            self.total_written += n
+            return n
+
+    def peek(self, n):
+        """Return a view of the oldest ``n`` samples without consuming them.
+
+        The view aliases the ring storage: it is only stable while ``lock`` is
+        held and nothing is consumed, because any write after a ``consume``
+        may reuse the freed samples. Copy it before consuming if it must
+        outlive the lock. It is left writeable so torch.from_numpy accepts it.
+        """
+        with self.lock:
+            if n > self._size:
+                return None
+            return self._data[self._start:self._start + n]
+
+    def consume(self, n):
+        """Discard the oldest ``n`` samples"""
+        with self.lock:
+            self._advance(min(n, self._size))
+
+    def _advance(self, n):
+        self._start = (self._start + n) % self.capacity
+        self._size -= n
+
+    def clear(self):
+        """Drop all samples and reset counters (storage is reused)"""
+        with self.lock:
+            self._start = 0
+            self._size = 0
+            self.total_written = 0
+            self.dropped_samples = 0
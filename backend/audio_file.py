@@ -0,0 +1,95 @@
+import os
+import struct
+
+import numpy as np
+from scipy import signal
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def open_audio(path, sample_rate=16000, channels=1):
+    """Memory-map a WAV or raw 16-bit PCM file without reading it into RAM.
+
+    Returns ``(frames, sample_rate)`` where ``frames`` is an ``np.memmap`` of
+    shape (n_frames, channels). Raw ``.pcm``/``.raw`` files are taken as
+    little-endian int16 with the given sample rate and channel count.
+    """
+    if os.path.splitext(path)[1].lower() in ('.pcm', '.raw'):
+        n_frames = os.path.getsize(path) // (2 * channels)
+        return np.memmap(path, dtype='<i2', mode='r', shape=(n_frames, channels)), sample_rate
+
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+            elif chunk_id == b'data':
+                data_offset = f.tell()
+                data_size = chunk_size
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)  # chunks are word-aligned
+
+    if fmt is None:
+        raise ValueError(f"{path} has no fmt chunk")
+    format_tag, channels, sample_rate, _, _, bits = fmt
+    if format_tag in (WAV_FORMAT_PCM, WAV_FORMAT_EXTENSIBLE) and bits == 16:
+        dtype = np.dtype('<i2')
+    elif format_tag in (WAV_FORMAT_FLOAT, WAV_FORMAT_EXTENSIBLE) and bits == 32:
+        dtype = np.dtype('<f4')
+    else:
+        raise ValueError(f"Unsupported WAV encoding (format {format_tag}, {bits} bits)")
+
+    # Streaming writers sometimes leave the data size unset; trust the file size then
+    available = os.path.getsize(path) - data_offset
+    data_size = available if data_size in (0, 0xFFFFFFFF) else min(data_size, available)
+    n_frames = data_size // (dtype.itemsize * channels)
+    frames = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(n_frames, channels))
+    return frames, sample_rate
+
+
+def split_at_silence(frames, sample_rate, max_chunk_seconds=30, search_seconds=5, frame_ms=30):
+    """Chunk boundaries (frame indices) no longer than ``max_chunk_seconds``.
+
+    Each cut goes at the quietest short frame within the last ``search_seconds``
+    of the chunk. Only those search regions are read from the memory map.
+    """
+    total = len(frames)
+    max_chunk = int(max_chunk_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), max_chunk // 2)
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+
+    boundaries = [0]
+    while total - boundaries[-1] > max_chunk:
+        region_start = boundaries[-1] + max_chunk - search
+        region = np.asarray(frames[region_start:region_start + search], dtype=np.float32)
+        region = region.mean(axis=1) if region.ndim == 2 else region
+        n = len(region) // frame_len
+        energy = np.mean(region[:n * frame_len].reshape(n, frame_len) ** 2, axis=1)
+        boundaries.append(region_start + int(np.argmin(energy)) * frame_len)
+    boundaries.append(total)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_chunk(frames, start, end, sample_rate, target_rate=16000):
+    """Decode frames[start:end] to mono float32 in [-1, 1] at ``target_rate``"""
+    chunk = np.asarray(frames[start:end])
+    audio = chunk.mean(axis=1) if chunk.shape[1] > 1 else chunk[:, 0]
+    if chunk.dtype == np.int16:
+        audio = audio.astype(np.float32) / 32768.0
+    audio = audio.astype(np.float32, copy=False)
+    if sample_rate != target_rate:
+        divisor = np.gcd(sample_rate, target_rate)
+        audio = signal.resample_poly(audio, target_rate // divisor, sample_rate // divisor).astype(np.float32)
+    return audio
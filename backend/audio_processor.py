@@ -2,79 +2,207 @@ import numpy as np
 import wave
 import io
 import base64
-from scipy import signal
+import threading
+import time
+from collections import deque, namedtuple
+
+from audio_buffer import RingBuffer
+from dsp import build_pipeline
+from metrics import AUDIO_CHUNK_SECONDS, AUDIO_BUFFER_WAIT_SECONDS
+
+DECODE_SECONDS = AUDIO_CHUNK_SECONDS.labels('decode')
+NORMALIZE_SECONDS = AUDIO_CHUNK_SECONDS.labels('normalize')
+
+# One transcription window: samples, where it sits in the stream, where the next
+# window will start, and when it became complete (time.monotonic of the write
+# that delivered its last sample)
+AudioWindow = namedtuple('AudioWindow', ['samples', 'start_sample', 'next_start_sample', 'ready_time'])
 
 class AudioProcessor:
-    def __init__(self, sample_rate=16000, chunk_size=1024):
+    def __init__(self, sample_rate=16000, chunk_size=1024, buffer_seconds=60,
+                 window_seconds=5, overlap=0.5, lowpass_hz=4000, highpass_hz=0,
+                 gain_db=0):
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
         self.sample_rate = sample_rate
         self.chunk_size = chunk_size
-        self.audio_buffer = []
+        self.window_seconds = window_seconds
+        self.overlap = overlap
+        # Fixed-size float32 storage: memory stays flat however long the session runs
+        self.audio_buffer = RingBuffer(int(sample_rate * buffer_seconds))
+        # Per-session DSP chain; coefficients are designed once and cached
+        self.pipeline = build_pipeline(sample_rate, lowpass_hz, highpass_hz, gain_db)
+        # Signalled whenever a full window is buffered (shares the buffer lock)
+        self.window_ready = threading.Condition(self.audio_buffer.lock)
+        # (absolute end sample, arrival time) per write, for per-window latency
+        self._arrivals = deque()
+        # Absolute sample index up to which audio has been handed out in a window
+        self.taken_until = 0
         
     def process_audio_chunk(self, audio_data):
         """Process incoming audio chunk"""
         try:
+            started = time.perf_counter()
             # Decode base64 audio data
             audio_bytes = base64.b64decode(audio_data)
             
             # Convert bytes to numpy array
             audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
+            DECODE_SECONDS.observe(time.perf_counter() - started)
             
-            # Normalize audio
-            audio_normalized = self.normalize_audio(audio_array)
-            
-            # Convert normalized audio back to list for buffer storage
-            # But ensure it stays as numpy array for processing
-            self.audio_buffer.extend(audio_normalized.tolist())
-            
-            return audio_normalized
+            return self.process_pcm_blocks([audio_array])
             
         except Exception as e:
             print(f"Error processing audio chunk: {e}")
             return None
     
-    def normalize_audio(self, audio_data):
-        """Normalize audio data"""
-        # Convert to numpy array if it's a list
+    def process_pcm_blocks(self, blocks):
+        """Normalize consecutive PCM blocks in one filter pass and buffer them"""
+        started = time.perf_counter()
+        audio_normalized = self.pipeline.process_batch([self.to_float32(b) for b in blocks])
+        NORMALIZE_SECONDS.observe(time.perf_counter() - started)
+        
+        # Store float32 samples directly in the ring buffer
+        with self.window_ready:
+            self.audio_buffer.write(audio_normalized)
+            self._arrivals.append((self.audio_buffer.total_written, time.monotonic()))
+            if len(self.audio_buffer) >= self.window_samples():
+                self.window_ready.notify_all()
+        
+        return audio_normalized
+    
+    @staticmethod
+    def to_float32(audio_data):
+        """Convert PCM samples to float32 in [-1, 1]"""
         if isinstance(audio_data, list):
             audio_data = np.array(audio_data, dtype=np.float32)
-        elif audio_data.dtype != np.float32:
-            audio_data = audio_data.astype(np.float32)
-        
-        # Normalize to [-1, 1]
-        if np.max(np.abs(audio_data)) > 0:
-            audio_data = audio_data / np.max(np.abs(audio_data))
+        if audio_data.dtype == np.int16:
+            return audio_data.astype(np.float32) / 32768.0
+        return audio_data.astype(np.float32, copy=False)
+    
+    def normalize_audio(self, audio_data):
+        """Normalize audio data"""
+        audio_data = self.to_float32(audio_data)
         
-        # Apply low-pass filter to remove noise
+        # Stateful filter chain: no per-chunk redesign, no edge artifacts
         try:
-            nyquist = self.sample_rate // 2
-            cutoff = min(4000, nyquist - 1)  # 4kHz cutoff
-            b, a = signal.butter(4, cutoff / nyquist, btype='low')
-            audio_filtered = signal.filtfilt(b, a, audio_data)
-            return audio_filtered
+            return self.pipeline.process(audio_data)
         except Exception as e:
             print(f"Filter error: {e}")
             return audio_data  # Return unfiltered if filter fails
     
-    def get_audio_for_transcription(self, duration_seconds=5):
-        """Get audio chunk for transcription"""
-        samples_needed = int(self.sample_rate * duration_seconds)
+    def window_samples(self, duration_seconds=None):
+        """Samples in one transcription window (never more than the buffer holds)"""
+        samples = int(self.sample_rate * (duration_seconds or self.window_seconds))
+        return min(samples, self.audio_buffer.capacity)
+    
+    def get_audio_for_transcription(self, duration_seconds=None, as_wav=False):
+        """Get audio chunk for transcription.
         
-        if len(self.audio_buffer) >= samples_needed:
-            # Get the required samples and convert back to numpy array
-            audio_chunk = np.array(self.audio_buffer[:samples_needed], dtype=np.float32)
+        Returns float32 samples that can be passed straight to Whisper (a
+        private copy, so later writes to the buffer never change them). Pass
+        ``as_wav=True`` to get 16-bit WAV bytes instead (export only).
+        """
+        window = self.next_window(duration_seconds)
+        if window is None:
+            return None
+        if as_wav:
+            return self.array_to_wav(window.samples)
+        return window.samples
+    
+    def next_window(self, duration_seconds=None):
+        """Take the next window as an AudioWindow, or None if not enough audio is buffered"""
+        samples_needed = self.window_samples(duration_seconds)
+        
+        with self.audio_buffer.lock:
+            # Copy the oldest window while the lock is held: once its first hop is
+            # consumed, the next write may reuse that part of the ring storage
+            audio_chunk = self.audio_buffer.peek(samples_needed)
+            if audio_chunk is None:
+                return None
+            audio_chunk = audio_chunk.copy()
             
-            # Remove processed samples from buffer
-            self.audio_buffer = self.audio_buffer[samples_needed//2:]  # 50% overlap
+            start_sample = self.audio_buffer.start_sample
+            ready_time = self._arrival_time(start_sample + samples_needed)
+            self.taken_until = start_sample + samples_needed
             
-            # Convert to wav format
-            return self.array_to_wav(audio_chunk)
+            # Advance by one hop, keeping the configured overlap
+            self.audio_buffer.consume(self.hop_samples(samples_needed))
+            self._prune_arrivals()
         
-        return None
+        AUDIO_BUFFER_WAIT_SECONDS.observe(max(0.0, time.monotonic() - ready_time))
+        return AudioWindow(audio_chunk, start_sample, self.audio_buffer.start_sample, ready_time)
+    
+    def take_remaining(self, min_new_seconds=0.1):
+        """Take everything still buffered as a final (shorter) AudioWindow and empty the buffer.
+        
+        Used when a session stops: the trailing audio never fills a whole window.
+        Returns None unless at least ``min_new_seconds`` of it was not in any
+        earlier window.
+        """
+        with self.audio_buffer.lock:
+            size = len(self.audio_buffer)
+            start_sample = self.audio_buffer.start_sample
+            end_sample = start_sample + size
+            new_samples = end_sample - max(start_sample, self.taken_until)
+            audio_chunk = None
+            if size and new_samples >= min_new_seconds * self.sample_rate:
+                audio_chunk = self.audio_buffer.peek(size).copy()
+                self.taken_until = end_sample
+            self.audio_buffer.consume(size)
+            self._prune_arrivals()
+        
+        if audio_chunk is None:
+            return None
+        return AudioWindow(audio_chunk, start_sample, end_sample, time.monotonic())
+    
+    def drop_oldest(self, seconds):
+        """Discard up to ``seconds`` of the oldest buffered audio; returns seconds dropped"""
+        with self.audio_buffer.lock:
+            samples = min(int(seconds * self.sample_rate), len(self.audio_buffer))
+            self.audio_buffer.consume(samples)
+            self._prune_arrivals()
+        return samples / self.sample_rate
+    
+    def _prune_arrivals(self):
+        while self._arrivals and self._arrivals[0][0] <= self.audio_buffer.start_sample:
+            self._arrivals.popleft()
+    
+    def _arrival_time(self, sample_index):
+        for end_sample, arrived in self._arrivals:
+            if end_sample >= sample_index:
+                return arrived
+        return time.monotonic()
+    
+    def wait_for_window(self, timeout=None, duration_seconds=None):
+        """Block until a full window is buffered (or timeout/wake); returns True if one is ready"""
+        samples_needed = self.window_samples(duration_seconds)
+        with self.window_ready:
+            if len(self.audio_buffer) < samples_needed:
+                self.window_ready.wait(timeout)
+            return len(self.audio_buffer) >= samples_needed
+    
+    def wake(self):
+        """Wake any thread blocked in wait_for_window (e.g. on shutdown)"""
+        with self.window_ready:
+            self.window_ready.notify_all()
+    
+    def pending_windows(self, duration_seconds=None):
+        """Number of full windows that could be taken right now (backlog depth)"""
+        samples_needed = self.window_samples(duration_seconds)
+        buffered = len(self.audio_buffer)
+        if buffered < samples_needed:
+            return 0
+        return 1 + (buffered - samples_needed) // self.hop_samples(samples_needed)
+    
+    def hop_samples(self, window_samples):
+        """Number of samples to advance between consecutive windows"""
+        return max(1, int(window_samples * (1 - self.overlap)))
     
     def array_to_wav(self, audio_array):
         """Convert numpy array to WAV bytes"""
         # Convert to 16-bit PCM
-        audio_int16 = (audio_array * 32767).astype(np.int16)
+        audio_int16 = (np.clip(audio_array, -1.0, 1.0) * 32767).astype(np.int16)
         
         # Create WAV file in memory
         wav_buffer = io.BytesIO()
@@ -89,4 +217,8 @@ class AudioProcessor:
     
     def clear_buffer(self):
         """Clear the audio buffer"""
-        self.audio_buffer = []
+        with self.window_ready:
+            self.audio_buffer.clear()
+            self._arrivals.clear()
+            self.taken_until = 0
+        self.pipeline.reset()
@@ -0,0 +1,170 @@
+import sys
+import threading
+import time
+from queue import Queue, Empty
+
+import numpy as np
+
+# whisper.decode works on fixed 30-second mel segments
+MAX_BATCH_SECONDS = 30
+
+
+def decode_batch(model, arrays, language="en", fp16=False, **options):
+    """Transcribe several <=30 s float32 windows with one batched encoder/decoder pass"""
+    import torch
+    import whisper
+
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)))
+        for audio in arrays
+    ]).to(model.device)
+    decoding = whisper.DecodingOptions(language=language, fp16=fp16,
+                                       without_timestamps=True, **options)
+    return [result.text.strip() for result in whisper.decode(model, mels, decoding)]
+
+
+class BatchJob:
+    def __init__(self, audio, callback=None, options=None):
+        self.audio = audio
+        self.callback = callback
+        self.options = options or {}
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the batch containing this job has run; returns the text"""
+        self._done.wait(timeout)
+        if self.error:
+            raise self.error
+        return self.result
+
+    def _finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+        if self.callback and error is None:
+            self.callback(result)
+
+
+class BatchScheduler:
+    """Collects ready windows and runs them through the model together.
+
+    A batch closes when it reaches ``max_batch_size`` or ``max_wait_ms`` after
+    its first job arrived. Jobs with different decode options (e.g. a session
+    the RTF controller switched to greedy decoding) are decoded in separate
+    passes. Each job's text is returned to its own waiter and callback.
+    """
+
+    def __init__(self, infer_batch, max_batch_size=8, max_wait_ms=50):
+        self.infer_batch = infer_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = Queue()
+        self.batches_run = 0
+        self.windows_run = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, audio, callback=None, options=None):
+        """Queue one window; the samples are copied so ring-buffer views can be reused"""
+        job = BatchJob(np.array(audio, dtype=np.float32), callback, options)
+        self.queue.put(job)
+        return job
+
+    def transcribe(self, audio, options=None):
+        return self.submit(audio, options=options).wait()
+
+    def _run(self):
+        while self.running:
+            try:
+                batch = [self.queue.get(timeout=1.0)]
+            except Empty:
+                continue
+
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except Empty:
+                    break
+
+            groups = {}
+            for job in batch:
+                groups.setdefault(tuple(sorted(job.options.items())), []).append(job)
+            for group in groups.values():
+                try:
+                    texts = self.infer_batch([job.audio for job in group], group[0].options)
+                    for job, text in zip(group, texts):
+                        job._finish(text)
+                except Exception as e:
+                    print(f"Batch transcription error: {e}")
+                    for job in group:
+                        job._finish(error=e)
+
+            self.batches_run += 1
+            self.windows_run += len(batch)
+
+    def get_stats(self):
+        return {
+            'batches_run': self.batches_run,
+            'windows_run': self.windows_run,
+            'mean_batch_size': round(self.windows_run / self.batches_run, 2) if self.batches_run else None,
+            'queued': self.queue.qsize(),
+        }
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=2)
+
+
+def benchmark(audio_path, model_name="base", n_windows=8, window_seconds=5, batch_size=8):
+    """Windows/sec for serial vs batched decoding of real speech on this CPU.
+
+    Both paths decode each window once with the same options (temperature 0,
+    no timestamps), so the difference is batching alone: noise would trigger
+    model.transcribe's temperature fallback and measure re-decoding instead.
+    """
+    import whisper
+
+    model = whisper.load_model(model_name, device="cpu")
+    audio = whisper.load_audio(audio_path)
+    step = 16000 * window_seconds
+    windows = [audio[i * step:(i + 1) * step] for i in range(n_windows)]
+    windows = [window for window in windows if len(window) == step]
+    if not windows:
+        raise ValueError(f"{audio_path} is shorter than one {window_seconds}s window")
+
+    # Warm-up so neither path pays for first-call allocation
+    decode_batch(model, windows[:1], temperature=0.0)
+
+    start = time.perf_counter()
+    for window in windows:
+        model.transcribe(window, language="en", fp16=False, verbose=None, temperature=0.0,
+                         without_timestamps=True, condition_on_previous_text=False)
+    serial = len(windows) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(windows), batch_size):
+        decode_batch(model, windows[i:i + batch_size], temperature=0.0)
+    batched = len(windows) / (time.perf_counter() - start)
+
+    return {'windows': len(windows), 'serial_windows_per_sec': serial, 'batched_windows_per_sec': batched}
+
+
+if __name__ == '__main__':
+    # python batching.py speech.wav [model_name]  (at least 8 x 5 s of real speech)
+    if len(sys.argv) < 2:
+        sys.exit("usage: python batching.py speech.wav [model_name]")
+    results = benchmark(*sys.argv[1:3])
+    print(f"{results['windows']} windows of speech")
+    print(f"serial  model.transcribe : {results['serial_windows_per_sec']:.2f} windows/sec")
+    print(f"batched whisper.decode   : {results['batched_windows_per_sec']:.2f} windows/sec")
+    speedup = results['batched_windows_per_sec'] / results['serial_windows_per_sec']
+    print(f"speedup {speedup:.2f}x: " + ("WHISPER_BATCH_SIZE > 1 pays off on this host" if speedup > 1.1
+                                       else "keep WHISPER_BATCH_SIZE=1 (batching off) on this host"))
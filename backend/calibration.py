@@ -0,0 +1,155 @@
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from whisper_backends import load_backend
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'calibration.json')
+
+
+def synthetic_clip(seconds=10, sample_rate=16000):
+    """Deterministic speech-like test clip: voiced syllables with gliding pitch,
+    formant-like harmonics and short pauses. No audio file has to ship with the repo."""
+    rng = np.random.default_rng(1234)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+
+    voiced = np.zeros_like(t)
+    for harmonic, weight in ((1, 1.0), (2, 0.6), (3, 0.45), (5, 0.3), (8, 0.15)):
+        voiced += weight * np.sin(harmonic * phase)
+
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)      # ~4 syllables/second
+    pauses = (np.sin(2 * np.pi * 0.35 * t) > -0.6).astype(float)  # breaks between phrases
+    clip = 0.1 * voiced * syllables * pauses + 0.003 * rng.standard_normal(len(t))
+    return clip.astype(np.float32)
+
+
+def host_key(backend, compute_type, threads):
+    """Cache key for this hardware and inference configuration"""
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{cpu}|threads={threads}|{backend}|{compute_type or 'default'}"
+
+
+def measure_rtf(backend, clip, sample_rate=16000):
+    """Real-time factor of one transcription of the clip (after a warm-up)"""
+    options = dict(language="en", fp16=False, temperature=0.0, condition_on_previous_text=False)
+    backend.transcribe(clip[:sample_rate], **options)
+    start = time.perf_counter()
+    backend.transcribe(clip, **options)
+    return (time.perf_counter() - start) / (len(clip) / sample_rate)
+
+
+def calibrate(candidates, backend="openai", compute_type=None, threads=0, target_rtf=0.5,
+              headroom=0.25, clip_seconds=10):
+    """Time candidate models from smallest to largest and pick the largest that
+    meets ``target_rtf * (1 - headroom)``. Returns (model_name, measurements)."""
+    clip = synthetic_clip(clip_seconds)
+    limit = target_rtf * (1 - headroom)
+    chosen = candidates[0]
+    measurements = {}
+
+    for model_name in candidates:
+        model = load_backend(backend, model_name, compute_type, threads)
+        rtf = measure_rtf(model, clip)
+        measurements[model_name] = round(rtf, 3)
+        print(f"Calibration: {model_name} RTF {rtf:.3f} (limit {limit:.3f})")
+        del model
+        gc.collect()
+        if rtf > limit:
+            break  # larger models will only be slower
+        chosen = model_name
+
+    return chosen, measurements
+
+
+def calibrate_in_subprocess(candidates, backend="openai", compute_type=None, threads=0, target_rtf=0.5,
+                            headroom=0.25):
+    """calibrate() in a fresh interpreter. The server process then never runs
+    inference (or starts the torch/OpenMP thread pool) before the Whisper
+    worker pool forks from it. Raises CalledProcessError if the child fails and
+    ValueError/KeyError if its last output line is not the JSON result."""
+    request = json.dumps({'candidates': list(candidates), 'backend': backend, 'compute_type': compute_type,
+                          'threads': threads, 'target_rtf': target_rtf, 'headroom': headroom})
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), request],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    if completed.stderr:
+        print(completed.stderr, end='', file=sys.stderr)
+    lines = completed.stdout.strip().splitlines()
+    for line in lines[:-1]:
+        print(line)
+    if not lines:
+        raise ValueError("calibration printed no result")
+    result = json.loads(lines[-1])
+    return result['model'], result['measurements']
+
+
+def choose_model(candidates, backend="openai", compute_type=None, threads=0, target_rtf=0.5,
+                 headroom=0.25, cache_path=DEFAULT_CACHE_PATH, force=False, fallback=None):
+    """Model name for this host, from the calibration cache or a fresh calibration.
+    
+    Calibration is optional: if it fails, ``fallback`` (default: the first
+    candidate) is returned and nothing is cached, so the next start retries.
+    """
+    fallback = fallback or candidates[0]
+    threads = threads or os.cpu_count() or 1
+    key = host_key(backend, compute_type, threads)
+    cache = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable calibration cache: {e}")
+
+    entry = cache.get(key)
+    if (entry and not force and entry.get('target_rtf') == target_rtf
+            and entry.get('headroom') == headroom and entry.get('model') in candidates):
+        print(f"Using cached calibration: {entry['model']} ({key})")
+        return entry['model']
+
+    print(f"Calibrating Whisper model size for {key}...")
+    try:
+        model_name, measurements = calibrate_in_subprocess(candidates, backend, compute_type, threads,
+                                                           target_rtf, headroom)
+    except subprocess.CalledProcessError as e:
+        details = (e.stderr or '').strip().splitlines()[-5:]
+        print(f"❌ Calibration failed (exit code {e.returncode}), using '{fallback}'"
+              + ''.join(f"\n    {line}" for line in details))
+        return fallback
+    except (ValueError, KeyError) as e:  # json.JSONDecodeError is a ValueError
+        print(f"❌ Calibration returned no usable result ({e!r}), using '{fallback}'")
+        return fallback
+    cache[key] = {
+        'model': model_name,
+        'target_rtf': target_rtf,
+        'headroom': headroom,
+        'measurements': measurements,
+        'calibrated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    print(f"✅ Calibration picked '{model_name}'")
+    return model_name
+
+
+if __name__ == '__main__':
+    # Used by calibrate_in_subprocess: python calibration.py '{"candidates": [...], ...}'
+    options = json.loads(sys.argv[1])
+    model_name, measurements = calibrate(options.pop('candidates'), **options)
+    print(json.dumps({'model': model_name, 'measurements': measurements}))
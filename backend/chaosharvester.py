@@ -1,3 +1,5 @@
+import streamlit_ui  # first: puts the repository root on sys.path
+import hashlib
 import pandas as pd
 import PyPDF2
 import docx
@@ -5,7 +7,6 @@ import json
 import os
 from typing import Dict, List, Any
 import streamlit as st
-from openai import OpenAI
 
 
 import requests
@@ -13,16 +14,34 @@ from bs4 import BeautifulSoup
 import sqlite3
 from datetime import datetime
 import time
+
+from map_reduce import MapReduceAnalyzer
+from llm_client import get_client
+from shared.config import Config
+from streamlit_ui import stream_to, show_first_token, show_llm_latency
+
 class ChaosInsighter:
     def __init__(self):
-        # Initialize OpenAI client with the new format
-        self.client = OpenAI(
-            api_key="8124c85892537a0bfcdae4b999e4eba2909c367431cab6a72589c2278e4c2cc4",
-            base_url="https://api.together.xyz/v1"
-        )
-        self.model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+        # Shared pooled, rate-limited client (one per endpoint for all sessions)
+        self.llm = get_client(Config.TOGETHER_API_KEY, Config.TOGETHER_BASE_URL, Config.TOGETHER_MODEL_NAME)
+        self.model_name = Config.TOGETHER_MODEL_NAME
         self.analyzed_content = ""
         self.file_summary = ""
+        # Whole-document analysis: chunks are condensed in parallel, then combined
+        self.analyzer = MapReduceAnalyzer(
+            self._complete,
+            chunk_tokens=Config.ANALYSIS_CHUNK_TOKENS,
+            max_workers=Config.ANALYSIS_MAX_CONCURRENCY,
+            stream=self._stream
+        )
+
+    def _complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """One chat completion with the configured model"""
+        return self.llm.complete(prompt, max_tokens, temperature, model=self.model_name)
+
+    def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        """Streamed chat completion: yields text as it is generated"""
+        return self.llm.stream_complete(prompt, max_tokens, temperature, model=self.model_name)
 
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF files"""
@@ -102,9 +121,9 @@ class ChaosInsighter:
         else:
             return f"Unsupported file format: {file_extension}"
 
-    def analyze_content(self, content: str) -> str:
-        """Analyze the extracted content and generate initial insights"""
-        prompt = f"""You are an advanced data analyst. Analyze the following content and provide comprehensive insights including:
+    def analyze_content(self, content: str, on_delta=None) -> str:
+        """Analyze the extracted content and generate initial insights (streamed to on_delta if given)"""
+        prompt = """You are an advanced data analyst. Analyze the following content and provide comprehensive insights including:
 
 1. Summary of the content
 2. Key themes and patterns
@@ -113,20 +132,14 @@ class ChaosInsighter:
 5. Overall assessment
 
 Content to analyze:
-{content[:4000]}  # Limiting content to avoid token limits
+{content}
 
 Provide detailed insights:"""
 
         try:
-            # Updated API call format for OpenAI 1.0+
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=1500
-            )
-
-            analysis = response.choices[0].message.content.strip()
+            # Long content is analyzed chunk by chunk instead of being truncated
+            analysis = self.analyzer.run(content, lambda text: prompt.format(content=text),
+                                         max_tokens=1500, temperature=0.3, on_delta=on_delta)
             self.analyzed_content = content
             self.file_summary = analysis
             return analysis
@@ -134,8 +147,8 @@ Provide detailed insights:"""
         except Exception as e:
             return f"Error during analysis: {str(e)}"
 
-    def answer_question(self, question: str) -> str:
-        """Answer specific questions about the analyzed content"""
+    def answer_question(self, question: str, on_delta=None) -> str:
+        """Answer specific questions about the analyzed content (streamed to on_delta if given)"""
         if not self.analyzed_content:
             return "No content has been analyzed yet. Please upload and analyze a file first."
 
@@ -152,15 +165,18 @@ User Question: {question}
 Answer:"""
 
         try:
-            # Updated API call format for OpenAI 1.0+
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1000
-            )
-
-            return response.choices[0].message.content.strip()
+            # Repeated questions about the same document are answered from the cache
+            # (near-duplicates too, when LLM_CACHE_SIMILARITY enables them)
+            document = hashlib.sha256(self.analyzed_content.encode('utf-8')).hexdigest()
+            if not on_delta:
+                return self.llm.complete(prompt, 1000, 0.2, model=self.model_name,
+                                         namespace=document, semantic_text=question)
+            parts = []
+            for delta in self.llm.stream_complete(prompt, 1000, 0.2, model=self.model_name,
+                                                  namespace=document, semantic_text=question):
+                parts.append(delta)
+                on_delta(delta)
+            return "".join(parts).strip()
 
         except Exception as e:
             return f"Error answering question: {str(e)}"
@@ -241,6 +257,7 @@ def streamlit_app():
     # Initialize session state
     if 'insighter' not in st.session_state:
         st.session_state.insighter = ChaosInsighter()
+    show_llm_latency(st.session_state.insighter.llm, st.session_state.insighter.model_name)
 
     # File upload
     uploaded_file = st.file_uploader(
@@ -257,12 +274,15 @@ def streamlit_app():
             with st.spinner("Processing file..."):
                 content = st.session_state.insighter.process_file(f"temp_{uploaded_file.name}")
 
+            st.markdown("### 📊 Analysis Results:")
+            placeholder = st.empty()
+            on_delta = stream_to(placeholder)
             with st.spinner("Analyzing content..."):
-                analysis = st.session_state.insighter.analyze_content(content)
+                analysis = st.session_state.insighter.analyze_content(content, on_delta=on_delta)
+            placeholder.markdown(analysis)
+            show_first_token(on_delta)
 
             st.success("Analysis complete!")
-            st.markdown("### 📊 Analysis Results:")
-            st.write(analysis)
 
             # Clean up temp file
             os.remove(f"temp_{uploaded_file.name}")
@@ -273,10 +293,13 @@ def streamlit_app():
         question = st.text_input("Enter your question about the analyzed content:")
 
         if st.button("Get Answer") and question:
-            with st.spinner("Finding answer..."):
-                answer = st.session_state.insighter.answer_question(question)
             st.markdown("### 💡 Answer:")
-            st.write(answer)
+            placeholder = st.empty()
+            on_delta = stream_to(placeholder)
+            with st.spinner("Finding answer..."):
+                answer = st.session_state.insighter.answer_question(question, on_delta=on_delta)
+            placeholder.markdown(answer)
+            show_first_token(on_delta)
 
 if __name__ == "__main__":
     import sys
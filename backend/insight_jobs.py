@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import INSIGHT_JOB_SECONDS
+
+
+class InsightJob:
+    """One background insight generation for a stopped session.
+
+    Progress and the result are pushed to ``room``; the client that stopped
+    the session joins it, and any client that asks for the job by id later
+    (e.g. after a reconnect) joins it too.
+    """
+
+    def __init__(self, session_id=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.room = f"insights:{self.id}"
+        self.status = 'queued'   # queued -> running -> done | failed
+        self.stage = 'queued'    # finer-grained step while running
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self, include_result=False):
+        data = {
+            'job_id': self.id,
+            'session_id': self.session_id,
+            'status': self.status,
+            'stage': self.stage,
+            'error': self.error,
+            'queued_seconds': round((self.started or time.time()) - self.created, 3),
+            'elapsed_seconds': round((self.finished or time.time()) - (self.started or time.time()), 3),
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+class InsightJobManager:
+    """Registry of insight jobs keyed by job id, run on a bounded thread pool.
+
+    Finished jobs are kept (oldest dropped beyond ``max_jobs``) so results can
+    be fetched again by id. The asyncio server runs jobs as coroutines and
+    only uses the bookkeeping (create/update/finish/fail).
+    """
+
+    def __init__(self, max_running=4, max_jobs=200):
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix='insights')
+
+    def create(self, session_id=None):
+        job = InsightJob(session_id)
+        with self._lock:
+            self.jobs[job.id] = job
+            # Drop the oldest finished jobs; running ones are always kept
+            for job_id in [old_id for old_id, old in self.jobs.items() if old.finished]:
+                if len(self.jobs) <= self.max_jobs:
+                    break
+                del self.jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, job, fn, *args):
+        """Run ``fn(job, *args)`` on the job pool"""
+        return self._executor.submit(fn, job, *args)
+
+    def update(self, job, stage):
+        if job.started is None:
+            job.started = time.time()
+        job.status = 'running'
+        job.stage = stage
+
+    def finish(self, job, result):
+        job.result = result
+        job.status = job.stage = 'done'
+        job.finished = time.time()
+        INSIGHT_JOB_SECONDS.labels('done').observe(job.finished - (job.started or job.created))
+
+    def fail(self, job, error):
+        job.error = str(error)
+        job.status = job.stage = 'failed'
+        job.finished = time.time()
+        INSIGHT_JOB_SECONDS.labels('failed').observe(job.finished - (job.started or job.created))
+
+    def get_stats(self):
+        jobs = list(self.jobs.values())
+        durations = [job.finished - job.started for job in jobs if job.finished and job.started]
+        return {
+            'queued': sum(1 for job in jobs if job.status == 'queued'),
+            'running': sum(1 for job in jobs if job.status == 'running'),
+            'done': sum(1 for job in jobs if job.status == 'done'),
+            'failed': sum(1 for job in jobs if job.status == 'failed'),
+            'mean_seconds': round(sum(durations) / len(durations), 3) if durations else None,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
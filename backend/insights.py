@@ -1,104 +1,264 @@
+import asyncio
+import inspect
 import json
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import requests
 
+from map_reduce import estimate_tokens
+
+# Rolling summaries of every generator in the process share these threads; each
+# generator's chunks still run one at a time, in order (see _drain_chunks)
+_summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='summaries')
+
 class InsightsGenerator:
-    def __init__(self, groq_client, model_name="llama-3.1-8b-instant"):
-        self.groq_client = groq_client
+    def __init__(self, llm_client, model_name="llama-3.1-8b-instant", rolling=True,
+                 summary_every_segments=20, summary_every_tokens=1500, max_partials=8,
+                 partial_max_tokens=200):
+        self.llm_client = llm_client
         self.model_name = model_name
         self.transcript_buffer = []
         self.last_insight_generation = 0
+        
+        # Rolling map-reduce: transcript chunks are summarized in the background while
+        # recording, so the final prompt holds at most max_partials summaries plus the
+        # unsummarized tail, however long the session runs
+        self.rolling = rolling
+        self.summary_every_segments = summary_every_segments
+        self.summary_every_tokens = summary_every_tokens
+        self.max_partials = max_partials
+        self.partial_max_tokens = partial_max_tokens
+        self.partials = []          # summaries of consecutive transcript chunks, in order
+        self.summarized_upto = 0    # transcript_buffer index covered by partials (or queued)
+        self.pending_tokens = 0
+        self.generation = 0         # bumped on clear so stale background jobs are ignored
+        self._summary_job = None
+        self._chunks = deque()      # (chunk, generation) waiting to be summarized
+        self._draining = False      # a _drain_chunks job is queued or running
+        self._lock = threading.Lock()
     
     def update_transcript(self, text):
         """Add new transcript text to buffer"""
-        self.transcript_buffer.append(text)
-        print(f"Updated transcript buffer: {len(self.transcript_buffer)} segments")
+        with self._lock:
+            self.transcript_buffer.append(text)
+            print(f"Updated transcript buffer: {len(self.transcript_buffer)} segments")
+            if not self.rolling:
+                return
+            self.pending_tokens += estimate_tokens(text)
+            pending_segments = len(self.transcript_buffer) - self.summarized_upto
+            if pending_segments >= self.summary_every_segments or self.pending_tokens >= self.summary_every_tokens:
+                chunk = " ".join(self.transcript_buffer[self.summarized_upto:])
+                self.summarized_upto = len(self.transcript_buffer)
+                self.pending_tokens = 0
+                self._chunks.append((chunk, self.generation))
+                if not self._draining:
+                    self._draining = True
+                    self._summary_job = _summary_executor.submit(self._drain_chunks)
+    
+    def _drain_chunks(self):
+        """Background job: summarize (and merge) queued chunks in order until none are left"""
+        while True:
+            with self._lock:
+                if not self._chunks:
+                    self._draining = False
+                    return
+                chunk, generation = self._chunks.popleft()
+            self._add_partial(chunk, generation)
+    
+    def _add_partial(self, chunk, generation):
+        """Background job: summarize one chunk and fold old summaries when there are too many"""
+        summary = self._summarize(
+            "Summarize this part of an audio transcript as concise notes. Keep facts, names, "
+            "numbers, decisions and action items.", chunk)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self.partials.append(summary)
+            if len(self.partials) <= self.max_partials:
+                return
+            earlier = list(self.partials)
+        
+        merged = self._summarize(
+            "Merge these notes on consecutive parts of one session into a single set of concise "
+            "notes. Keep facts, names, numbers, decisions and action items.", "\n\n".join(earlier))
+        with self._lock:
+            if generation == self.generation:
+                # Partials added meanwhile stay after the merged summary
+                self.partials = [merged] + self.partials[len(earlier):]
+        print(f"Merged {len(earlier)} partial summaries")
+    
+    def _summarize(self, instruction, text):
+        """One LLM summarization call; falls back to truncated text if the call fails"""
+        try:
+            response = self.llm_client.chat(
+                model=self.model_name,
+                messages=[{"role": "user", "content": f"{instruction}\n\n{text}"}],
+                temperature=0.1,
+                max_tokens=self.partial_max_tokens
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Partial summary error: {e}")
+            return text[:self.partial_max_tokens * 4]
     
     def should_generate_insights(self):
         """Not used in end-only approach - always return False"""
         return False  # Never generate during recording in Method 1
     
-    def generate_final_insights(self):
-        """Generate simple insights from entire session"""
+    def generate_final_insights(self, on_delta=None, on_progress=None):
+        """Generate simple insights from entire session; on_delta receives streamed text,
+        on_progress the current step ('summarizing', 'generating')"""
         if not self.transcript_buffer:
             print("No transcript data available for insights generation")
             return None
         
         try:
-            # Combine all transcript segments
-            full_transcript = " ".join(self.transcript_buffer)
-            print(f"Generating insights from {len(self.transcript_buffer)} transcript segments ({len(full_transcript)} characters)")
-            
-            # Improved prompt with stricter JSON formatting
-            simplified_prompt = f"""
-            Analyze this audio transcript and extract key insights. Return ONLY valid JSON without any additional text, explanations, or formatting.
-
-            TRANSCRIPT:
-            {full_transcript}
-
-            Extract 5-8 meaningful insights focusing on:
-            - Important information shared
-            - Key learnings or takeaways
-            - Notable points discussed
-            - Valuable knowledge mentioned
-
-            Response format (ONLY this JSON, nothing else):
-            {{"insights": ["insight 1", "insight 2", "insight 3", "insight 4", "insight 5"]}}
-            """
-            
-            response = self.groq_client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": simplified_prompt}],
-                temperature=0.1,  # Lower temperature for more consistent formatting
-                max_tokens=400    # Reduced tokens to prevent rambling
-            )
-            
-            insights_text = response.choices[0].message.content.strip()
-            print(f"Raw AI response: {insights_text}")
+            # Recording has stopped, so the drain job covers every queued chunk
+            if self._summary_job:
+                if on_progress and not self._summary_job.done():
+                    on_progress('summarizing')
+                self._summary_job.result()
+            request = self._final_request()
+            if on_progress:
+                on_progress('generating')
             
-            # Try to extract JSON if response contains extra text
-            insights_data = None
+            if on_delta:
+                # Stream tokens to the caller as they arrive, parse once complete
+                parts = []
+                for delta in self.llm_client.stream_chat(**request):
+                    parts.append(delta)
+                    on_delta(delta)
+                insights_text = "".join(parts).strip()
+            else:
+                response = self.llm_client.chat(**request)
+                insights_text = response.choices[0].message.content.strip()
+            return self._parse_insights(insights_text)
             
-            # Method 1: Try direct JSON parsing
-            try:
-                insights_data = json.loads(insights_text)
-            except json.JSONDecodeError:
-                # Method 2: Look for JSON within the response
-                import re
-                json_match = re.search(r'\{.*\}', insights_text, re.DOTALL)
-                if json_match:
-                    try:
-                        insights_data = json.loads(json_match.group())
-                    except json.JSONDecodeError:
-                        pass
-            
-            # Method 3: Fallback - extract insights from text manually
-            if not insights_data or 'insights' not in insights_data:
-                print("Fallback: Manually extracting insights from response")
-                # Extract numbered or bulleted items from the response
-                lines = insights_text.split('\n')
-                manual_insights = []
-                for line in lines:
-                    line = line.strip()
-                    if line and (line.startswith('-') or line.startswith('*') or 
-                            any(line.startswith(f"{i}.") for i in range(1, 10))):
-                        # Clean up the line
-                        cleaned = re.sub(r'^[-*\d\.\s]+', '', line).strip()
-                        if cleaned and len(cleaned) > 10:  # Only include substantial insights
-                            manual_insights.append(cleaned)
-                
-                if manual_insights:
-                    insights_data = {"insights": manual_insights[:8]}  # Limit to 8
-                else:
-                    insights_data = {"insights": ["Session contained valuable information but insights could not be extracted in the expected format"]}
+        except Exception as e:
+            print(f"Insights generation error: {e}")
+            return {"insights": [f"Error generating insights: {str(e)}"]}
+    
+    async def agenerate_final_insights(self, on_delta=None, on_progress=None):
+        """Async variant of generate_final_insights; the callbacks may return awaitables (e.g. sio.emit)"""
+        if not self.transcript_buffer:
+            print("No transcript data available for insights generation")
+            return None
+        
+        try:
+            if self._summary_job:
+                if on_progress and not self._summary_job.done():
+                    await self._maybe_await(on_progress('summarizing'))
+                await asyncio.wrap_future(self._summary_job)
+            request = self._final_request()
+            if on_progress:
+                await self._maybe_await(on_progress('generating'))
             
-            print(f"✅ Generated {len(insights_data.get('insights', []))} insights")
-            return insights_data
+            if on_delta:
+                parts = []
+                async for delta in self.llm_client.astream_chat(**request):
+                    parts.append(delta)
+                    await self._maybe_await(on_delta(delta))
+                insights_text = "".join(parts).strip()
+            else:
+                response = await self.llm_client.achat(**request)
+                insights_text = response.choices[0].message.content.strip()
+            return self._parse_insights(insights_text)
             
         except Exception as e:
             print(f"Insights generation error: {e}")
             return {"insights": [f"Error generating insights: {str(e)}"]}
+    
+    @staticmethod
+    async def _maybe_await(result):
+        if inspect.isawaitable(result):
+            await result
+    
+    def _final_request(self):
+        """Chat request for the final insights: partial summaries plus tail, or the full transcript"""
+        if self.rolling and self.summarized_upto:
+            with self._lock:
+                notes = "\n\n".join(self.partials)
+                tail = " ".join(self.transcript_buffer[self.summarized_upto:])
+            transcript_section = f"NOTES ON EARLIER PARTS (in order):\n{notes}"
+            if tail:
+                transcript_section += f"\n\nLATEST TRANSCRIPT:\n{tail}"
+            print(f"Generating insights from {len(self.partials)} partial summaries "
+                  f"and {len(self.transcript_buffer) - self.summarized_upto} recent segments "
+                  f"({len(transcript_section)} characters)")
+        else:
+            # Combine all transcript segments
+            full_transcript = " ".join(self.transcript_buffer)
+            transcript_section = f"TRANSCRIPT:\n{full_transcript}"
+            print(f"Generating insights from {len(self.transcript_buffer)} transcript segments ({len(full_transcript)} characters)")
+
+        # Improved prompt with stricter JSON formatting
+        simplified_prompt = f"""
+        Analyze this audio transcript and extract key insights. Return ONLY valid JSON without any additional text, explanations, or formatting.
+
+        {transcript_section}
+
+        Extract 5-8 meaningful insights focusing on:
+        - Important information shared
+        - Key learnings or takeaways
+        - Notable points discussed
+        - Valuable knowledge mentioned
+
+        Response format (ONLY this JSON, nothing else):
+        {{"insights": ["insight 1", "insight 2", "insight 3", "insight 4", "insight 5"]}}
+        """
+
+        return dict(
+            model=self.model_name,
+            messages=[{"role": "user", "content": simplified_prompt}],
+            temperature=0.1,  # Lower temperature for more consistent formatting
+            max_tokens=400    # Reduced tokens to prevent rambling
+        )
+    
+    def _parse_insights(self, insights_text):
+        """Parse the model's reply into {'insights': [...]}, tolerating extra text"""
+        print(f"Raw AI response: {insights_text}")
+        
+        # Try to extract JSON if response contains extra text
+        insights_data = None
+
+        # Method 1: Try direct JSON parsing
+        try:
+            insights_data = json.loads(insights_text)
+        except json.JSONDecodeError:
+            # Method 2: Look for JSON within the response
+            import re
+            json_match = re.search(r'\{.*\}', insights_text, re.DOTALL)
+            if json_match:
+                try:
+                    insights_data = json.loads(json_match.group())
+                except json.JSONDecodeError:
+                    pass
+
+        # Method 3: Fallback - extract insights from text manually
+        if not insights_data or 'insights' not in insights_data:
+            print("Fallback: Manually extracting insights from response")
+            # Extract numbered or bulleted items from the response
+            lines = insights_text.split('\n')
+            manual_insights = []
+            for line in lines:
+                line = line.strip()
+                if line and (line.startswith('-') or line.startswith('*') or 
+                        any(line.startswith(f"{i}.") for i in range(1, 10))):
+                    # Clean up the line
+                    cleaned = re.sub(r'^[-*\d\.\s]+', '', line).strip()
+                    if cleaned and len(cleaned) > 10:  # Only include substantial insights
+                        manual_insights.append(cleaned)
+
+            if manual_insights:
+                insights_data = {"insights": manual_insights[:8]}  # Limit to 8
+            else:
+                insights_data = {"insights": ["Session contained valuable information but insights could not be extracted in the expected format"]}
+
+        print(f"✅ Generated {len(insights_data.get('insights', []))} insights")
+        return insights_data
 
         
     def get_latest_insights(self):
@@ -107,5 +267,11 @@ class InsightsGenerator:
         
     def clear_buffer(self):
             """Clear the transcript buffer"""
-            self.transcript_buffer = []
+            with self._lock:
+                self.transcript_buffer = []
+                self.partials = []
+                self.summarized_upto = 0
+                self.pending_tokens = 0
+                self.generation += 1
+                self._chunks.clear()
             print("Transcript buffer cleared")
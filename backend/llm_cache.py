@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'llm_cache.db')
+
+
+def hashing_embedding(text, dimensions=1024):
+    """Dependency-free text vector: hashed word unigrams and bigrams, L2-normalized.
+
+    crc32 keeps the hashing stable across processes (``hash()`` is salted).
+    Good enough to catch reworded duplicates such as a question asked again
+    with different casing, punctuation or a filler word.
+    """
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in features:
+        h = zlib.crc32(feature.encode('utf-8'))
+        vector[h % dimensions] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+NEGATIONS = {'not', 'no', 'never', 'without', "don't", "doesn't", "isn't", "aren't", "wasn't", "weren't"}
+
+
+def salient_terms(text):
+    """Terms a near-duplicate must repeat exactly: numbers and other tokens with digits
+    (Q1, 2024, 15%), capitalized names after the first word of a sentence (product A,
+    Tata Sierra) and negations. A bag-of-words embedding barely moves when one of
+    these changes, yet the question then asks something else."""
+    terms = set()
+    for sentence in re.split(r"[.?!]\s+", text):
+        for index, word in enumerate(re.findall(r"[\w'%$]+", sentence)):
+            if any(c.isdigit() for c in word) or word.lower() in NEGATIONS or (index and word[0].isupper()):
+                terms.add(word.lower())
+    return " ".join(sorted(terms))
+
+
+class LLMCache:
+    """SQLite cache of LLM responses with TTL and size-bounded LRU eviction.
+
+    Exact lookups are keyed by a hash of the model, the sampling parameters
+    and the prompt. Entries stored with a ``semantic_text`` (e.g. the user's
+    question) and a ``namespace`` (e.g. a hash of the document) can also be
+    served to a later near-duplicate: same namespace and model, the same
+    salient terms (numbers, names, negations) and embedding cosine
+    similarity at or above ``similarity_threshold``. Near-duplicate lookup
+    is off by default (threshold 0): the hashing embedding cannot tell
+    paraphrases from different questions, so enable it only with a real
+    embedding model passed as ``embed``.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_bytes=64 * 1024 * 1024,
+                 similarity_threshold=0.0, embed=hashing_embedding):
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                namespace TEXT,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                terms TEXT,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(responses)')}
+        if 'terms' not in columns:
+            # Entries cached before terms were stored are never served as near-duplicates
+            self.conn.execute('ALTER TABLE responses ADD COLUMN terms TEXT')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_namespace ON responses (namespace, model)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def key(model, messages, params=None):
+        payload = json.dumps({'model': model, 'messages': messages, 'params': params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, model=None, namespace=None, semantic_text=None):
+        """Cached response for the exact key, else for a near-duplicate; None on a miss"""
+        with self._lock:
+            now = time.time()
+            row = self.conn.execute('SELECT key, response FROM responses WHERE key = ? AND created >= ?',
+                                    (key, now - self.ttl)).fetchone()
+            if row is None and semantic_text and namespace and self.similarity_threshold:
+                row = self._similar(model, namespace, semantic_text, now)
+                if row is not None:
+                    self.semantic_hits += 1
+            elif row is not None:
+                self.hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, row[0]))
+            self.conn.commit()
+            return row[1]
+
+    def _similar(self, model, namespace, semantic_text, now):
+        rows = self.conn.execute(
+            'SELECT key, response, embedding FROM responses '
+            'WHERE namespace = ? AND model = ? AND terms = ? AND embedding IS NOT NULL AND created >= ?',
+            (namespace, model, salient_terms(semantic_text), now - self.ttl)
+        ).fetchall()
+        if not rows:
+            return None
+        query = self.embed(semantic_text)
+        best, best_score = None, self.similarity_threshold
+        for row_key, response, blob in rows:
+            score = float(np.dot(query, np.frombuffer(blob, dtype=np.float32)))
+            if score >= best_score:
+                best, best_score = (row_key, response), score
+        return best
+
+    def put(self, key, model, response, namespace=None, semantic_text=None):
+        embedding = self.embed(semantic_text).astype(np.float32).tobytes() if semantic_text else None
+        terms = salient_terms(semantic_text) if semantic_text else None
+        size = len(response.encode('utf-8')) + (len(embedding) if embedding else 0)
+        now = time.time()
+        with self._lock:
+            previous = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, model, namespace, response, embedding, terms, size, created, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, model, namespace, response, embedding, terms, size, now, now)
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+
+            # Expired entries go first, then least recently used ones
+            expired = self.conn.execute('SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses WHERE created < ?',
+                                        (now - self.ttl,)).fetchone()
+            if expired[1]:
+                self.conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+                self.total_bytes -= expired[0]
+                self.evictions += expired[1]
+            while self.total_bytes > self.max_bytes:
+                oldest = self.conn.execute('SELECT key, size FROM responses ORDER BY last_used LIMIT 64').fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    self.conn.execute('DELETE FROM responses WHERE key = ?', (old_key,))
+                    self.total_bytes -= old_size
+                    self.evictions += 1
+            self.conn.commit()
+
+    def get_stats(self):
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.semantic_hits) / lookups, 3) if lookups else None,
+                'entries': entries,
+                'bytes': self.total_bytes,
+                'evictions': self.evictions,
+            }
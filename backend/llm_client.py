@@ -0,0 +1,402 @@
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from map_reduce import estimate_tokens
+from llm_cache import LLMCache
+from metrics import LLM_REQUEST_SECONDS, LLM_FIRST_TOKEN_SECONDS, LLM_TOKENS, LLM_ERRORS, LLM_RETRIES
+from shared.config import Config
+
+# Status codes worth retrying: rate limited or a transient server-side failure
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate_per_minute``; a rate of 0 disables it.
+
+    ``reserve`` takes tokens immediately (the balance may go negative) and
+    returns how long the caller must wait, so the same bucket serves
+    threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount):
+        """Give back tokens reserved on an estimate (negative amount charges extra)"""
+        if self.rate:
+            with self._lock:
+                self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.throttled_seconds = 0.0
+        self.latencies = deque(maxlen=1000)
+        self.first_token_latencies = deque(maxlen=1000)  # streamed calls only
+
+    def report(self):
+        def percentile(samples, p):
+            samples = sorted(samples)
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3) if samples else None
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'throttled_seconds': round(self.throttled_seconds, 2),
+            'latency_p50_seconds': percentile(self.latencies, 0.5),
+            'latency_p95_seconds': percentile(self.latencies, 0.95),
+            'time_to_first_token_p50_seconds': percentile(self.first_token_latencies, 0.5),
+            'time_to_first_token_p95_seconds': percentile(self.first_token_latencies, 0.95),
+        }
+
+
+class LLMClient:
+    """OpenAI-compatible chat client shared by every component that calls an LLM.
+
+    One pooled keep-alive HTTP client per endpoint (sync and async), request
+    and token-per-minute limits, retries with jittered exponential backoff on
+    429/5xx and connection errors, and per-model latency/token metrics.
+    """
+
+    def __init__(self, api_key, base_url, default_model=None, requests_per_minute=0, tokens_per_minute=0,
+                 max_retries=4, timeout=60.0, max_connections=20, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.default_model = default_model
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.metrics = {}
+        self._metrics_lock = threading.Lock()
+        # Optional LLMCache consulted by complete()/acomplete()
+        self.cache = cache
+
+        # Retries are handled here, so the SDK's own retry loop is turned off
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                             http_client=httpx.Client(limits=self.limits, timeout=timeout))
+        self._async_client = None
+        self._async_loop = None
+
+    @property
+    def async_client(self):
+        # httpx.AsyncClient is bound to the event loop it first ran on
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout,
+                http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout))
+            self._async_loop = loop
+        return self._async_client
+
+    def chat(self, messages, model=None, max_tokens=None, **options):
+        """Chat completion (blocking); returns the SDK response object"""
+        model = model or self.default_model
+        estimate = self._estimate(messages, max_tokens)
+        if max_tokens is not None:
+            options['max_tokens'] = max_tokens
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._throttle(model, estimate))
+            started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model, messages=messages, **options)
+            except Exception as e:
+                delay = self._failed(model, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeeded(model, response, estimate, time.monotonic() - started)
+            return response
+
+    async def achat(self, messages, model=None, max_tokens=None, **options):
+        """Chat completion (async); returns the SDK response object"""
+        model = model or self.default_model
+        estimate = self._estimate(messages, max_tokens)
+        if max_tokens is not None:
+            options['max_tokens'] = max_tokens
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self._throttle(model, estimate))
+            started = time.monotonic()
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=model, messages=messages, **options)
+            except Exception as e:
+                delay = self._failed(model, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(model, response, estimate, time.monotonic() - started)
+            return response
+
+    def stream_chat(self, messages, model=None, max_tokens=None, **options):
+        """Chat completion streamed as text deltas.
+
+        Failures before the first chunk are retried like ``chat``; once text
+        has been handed to the caller an error is raised instead.
+        """
+        model = model or self.default_model
+        estimate = self._estimate(messages, max_tokens)
+        if max_tokens is not None:
+            options['max_tokens'] = max_tokens
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self._throttle(model, estimate))
+            started = time.monotonic()
+            try:
+                stream = iter(self.client.chat.completions.create(
+                    model=model, messages=messages, stream=True, **options))
+                first = next(stream, None)
+            except Exception as e:
+                delay = self._failed(model, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+
+            parts = []
+            for chunk in itertools.chain([first] if first is not None else [], stream):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not parts:
+                        self._first_token(model, time.monotonic() - started)
+                    parts.append(delta)
+                    yield delta
+            self._stream_finished(model, "".join(parts), estimate, time.monotonic() - started)
+            return
+
+    async def astream_chat(self, messages, model=None, max_tokens=None, **options):
+        """Async variant of ``stream_chat``"""
+        model = model or self.default_model
+        estimate = self._estimate(messages, max_tokens)
+        if max_tokens is not None:
+            options['max_tokens'] = max_tokens
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self._throttle(model, estimate))
+            started = time.monotonic()
+            try:
+                stream = await self.async_client.chat.completions.create(
+                    model=model, messages=messages, stream=True, **options)
+                stream = stream.__aiter__()
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    first = None
+            except Exception as e:
+                delay = self._failed(model, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            async def chunks(first=first, stream=stream):
+                if first is not None:
+                    yield first
+                async for chunk in stream:
+                    yield chunk
+
+            parts = []
+            async for chunk in chunks():
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not parts:
+                        self._first_token(model, time.monotonic() - started)
+                    parts.append(delta)
+                    yield delta
+            self._stream_finished(model, "".join(parts), estimate, time.monotonic() - started)
+            return
+
+    def stream_complete(self, prompt, max_tokens=None, temperature=0.3, model=None, namespace=None,
+                        semantic_text=None):
+        """Streamed ``complete``: yields text deltas; a cache hit arrives as one delta"""
+        model = model or self.default_model
+        messages = [{"role": "user", "content": prompt}]
+        key = self._cache_key(model, messages, max_tokens, temperature)
+        cached = self.cache.get(key, model, namespace, semantic_text) if key else None
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for delta in self.stream_chat(messages, model=model, max_tokens=max_tokens, temperature=temperature):
+            parts.append(delta)
+            yield delta
+        if key:
+            self.cache.put(key, model, "".join(parts).strip(), namespace, semantic_text)
+
+    def complete(self, prompt, max_tokens=None, temperature=0.3, model=None, namespace=None, semantic_text=None):
+        """Single user prompt in, stripped response text out.
+
+        With a cache, identical calls are answered from it; passing ``namespace``
+        (e.g. a document hash) and ``semantic_text`` (e.g. the question) also
+        serves near-duplicate questions about the same document, if the cache has
+        a similarity threshold set.
+        """
+        model = model or self.default_model
+        messages = [{"role": "user", "content": prompt}]
+        key = self._cache_key(model, messages, max_tokens, temperature)
+        cached = self.cache.get(key, model, namespace, semantic_text) if key else None
+        if cached is not None:
+            return cached
+        response = self.chat(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+        text = response.choices[0].message.content.strip()
+        if key:
+            self.cache.put(key, model, text, namespace, semantic_text)
+        return text
+
+    async def acomplete(self, prompt, max_tokens=None, temperature=0.3, model=None, namespace=None,
+                        semantic_text=None):
+        model = model or self.default_model
+        messages = [{"role": "user", "content": prompt}]
+        key = self._cache_key(model, messages, max_tokens, temperature)
+        cached = self.cache.get(key, model, namespace, semantic_text) if key else None
+        if cached is not None:
+            return cached
+        response = await self.achat(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+        text = response.choices[0].message.content.strip()
+        if key:
+            self.cache.put(key, model, text, namespace, semantic_text)
+        return text
+
+    def _cache_key(self, model, messages, max_tokens, temperature):
+        if not self.cache:
+            return None
+        return self.cache.key(model, messages, {'max_tokens': max_tokens, 'temperature': temperature})
+
+    def _estimate(self, messages, max_tokens):
+        return sum(estimate_tokens(message["content"]) for message in messages) + (max_tokens or 0)
+
+    def _model_metrics(self, model):
+        with self._metrics_lock:
+            return self.metrics.setdefault(model, ModelMetrics())
+
+    def _throttle(self, model, estimate):
+        delay = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimate))
+        if delay:
+            self._model_metrics(model).throttled_seconds += delay
+        return delay
+
+    def _failed(self, model, error, attempt):
+        """Backoff before the next attempt, or None if the error is final"""
+        metrics = self._model_metrics(model)
+        status = getattr(error, 'status_code', None)
+        retryable = (status in RETRY_STATUS
+                     or isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)))
+        if not retryable or attempt >= self.max_retries:
+            metrics.errors += 1
+            LLM_ERRORS.labels(model).inc()
+            return None
+
+        metrics.retries += 1
+        LLM_RETRIES.labels(model).inc()
+        delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        print(f"⚠️ LLM call to {model} failed ({status or type(error).__name__}), retrying in {delay:.1f}s")
+        return delay
+
+    def _succeeded(self, model, response, estimate, latency):
+        metrics = self._model_metrics(model)
+        metrics.requests += 1
+        metrics.latencies.append(latency)
+        LLM_REQUEST_SECONDS.labels(model, 'call').observe(latency)
+        usage = getattr(response, 'usage', None)
+        if usage:
+            metrics.prompt_tokens += usage.prompt_tokens or 0
+            metrics.completion_tokens += usage.completion_tokens or 0
+            LLM_TOKENS.labels(model, 'prompt').inc(usage.prompt_tokens or 0)
+            LLM_TOKENS.labels(model, 'completion').inc(usage.completion_tokens or 0)
+            # Settle the token bucket against what the call actually used
+            self.token_bucket.refund(estimate - (usage.total_tokens or estimate))
+
+    def _stream_finished(self, model, text, estimate, latency):
+        # Streams carry no usage block; count the completion by estimate
+        metrics = self._model_metrics(model)
+        metrics.requests += 1
+        metrics.latencies.append(latency)
+        completion_tokens = estimate_tokens(text)
+        metrics.completion_tokens += completion_tokens
+        LLM_REQUEST_SECONDS.labels(model, 'stream').observe(latency)
+        LLM_TOKENS.labels(model, 'completion').inc(completion_tokens)
+
+    def _first_token(self, model, latency):
+        self._model_metrics(model).first_token_latencies.append(latency)
+        LLM_FIRST_TOKEN_SECONDS.labels(model).observe(latency)
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            metrics = {model: metrics.report() for model, metrics in self.metrics.items()}
+        if self.cache:
+            metrics['cache'] = self.cache.get_stats()
+        return metrics
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_shared_cache = None
+
+
+def _get_cache():
+    """One response cache (one SQLite file) for every client in the process"""
+    global _shared_cache
+    if _shared_cache is None and Config.LLM_CACHE_ENABLED:
+        _shared_cache = LLMCache(
+            ttl_seconds=Config.LLM_CACHE_TTL_HOURS * 3600,
+            max_bytes=int(Config.LLM_CACHE_MB * 1024 * 1024),
+            similarity_threshold=Config.LLM_CACHE_SIMILARITY
+        )
+    return _shared_cache
+
+
+def get_client(api_key, base_url, default_model=None, **options):
+    """Process-wide client per endpoint, key and default model, so sessions share one connection pool"""
+    if not api_key:
+        raise ValueError(f"No API key configured for {base_url} (set it in the environment or .env)")
+    options.setdefault('requests_per_minute', Config.LLM_REQUESTS_PER_MINUTE)
+    options.setdefault('tokens_per_minute', Config.LLM_TOKENS_PER_MINUTE)
+    options.setdefault('max_retries', Config.LLM_MAX_RETRIES)
+    options.setdefault('timeout', Config.LLM_TIMEOUT_SECONDS)
+    options.setdefault('max_connections', Config.LLM_MAX_CONNECTIONS)
+    with _clients_lock:
+        options.setdefault('cache', _get_cache())
+        key = (base_url, api_key, default_model)
+        if key not in _clients:
+            _clients[key] = LLMClient(api_key, base_url, default_model, **options)
+        return _clients[key]
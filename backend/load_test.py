@@ -0,0 +1,215 @@
+"""Socket.IO load test for the audio backend (asgi_app.py or app.py).
+
+Opens ``--idle`` clients that connect and stay silent and ``--active`` clients
+that start a session and stream binary audio frames in real time. It reports
+connect times, the audio_frame -> audio_received round trip, the time from
+stop_session to session_stopped and the server's /health (session counts and,
+on the asyncio server, event-loop lag).
+
+    cd backend
+    MAX_SESSIONS=64 uvicorn asgi_app:app --port 5000
+    python load_test.py --idle 300 --active 40 --seconds 60
+
+The default signal is a speech-band tone mix that passes the VAD, so every
+window is dispatched to Whisper and the run includes real inference load.
+``--signal noise`` sends low-level noise that the VAD gates out, which
+measures only the socket, ingest and dispatch path (not transcription).
+"""
+import sys
+import os
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+import socketio
+
+from shared.audio_protocol import BINARY_TRANSPORT, encode_frame
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+    return f"p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms  max {max(samples) * 1000:.1f}ms  (n={len(samples)})"
+
+
+def make_signal(kind, sample_rate, seconds=10):
+    """A loop of int16 audio: quiet noise (gated out by the VAD) or a speech-band tone mix"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    if kind == 'tone':
+        audio = 0.2 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 660 * t)
+        audio *= 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)  # syllable-rate envelope
+    else:
+        audio = 0.002 * rng.standard_normal(len(t))
+    return (audio * 32767).astype(np.int16)
+
+
+class Results:
+    def __init__(self):
+        self.connect_seconds = []
+        self.ack_seconds = []
+        self.stop_seconds = []
+        self.errors = []
+        self.rejected = 0
+        self.transcripts = 0
+        self.frames_sent = 0
+
+
+async def connect_client(url, results):
+    client = socketio.AsyncClient(reconnection=False)
+    started = time.monotonic()
+    await client.connect(url, transports=['websocket'])
+    results.connect_seconds.append(time.monotonic() - started)
+    return client
+
+
+async def idle_client(url, results, stop):
+    try:
+        client = await connect_client(url, results)
+    except Exception as e:
+        results.errors.append(f"idle connect: {e}")
+        return
+    await stop.wait()
+    await client.disconnect()
+
+
+async def active_client(url, results, seconds, signal, sample_rate, frame_ms):
+    try:
+        client = await connect_client(url, results)
+    except Exception as e:
+        results.errors.append(f"active connect: {e}")
+        return
+
+    events = {name: asyncio.Event() for name in ('transport_selected', 'session_started', 'session_stopped')}
+    sent = {}
+
+    @client.on('transport_selected')
+    async def on_transport_selected(data):
+        events['transport_selected'].set()
+
+    @client.on('session_started')
+    async def on_session_started(data):
+        events['session_started'].set()
+
+    @client.on('session_error')
+    async def on_session_error(data):
+        results.rejected += 1
+        events['session_started'].set()
+
+    @client.on('session_stopped')
+    async def on_session_stopped(data):
+        events['session_stopped'].set()
+
+    @client.on('audio_received')
+    async def on_audio_received(data):
+        sent_at = sent.pop(data.get('seq'), None)
+        if sent_at is not None:
+            results.ack_seconds.append(time.monotonic() - sent_at)
+
+    @client.on('new_transcript')
+    async def on_new_transcript(data):
+        results.transcripts += 1
+
+    try:
+        await client.emit('negotiate_transport', {'transports': [BINARY_TRANSPORT]})
+        await asyncio.wait_for(events['transport_selected'].wait(), 10)
+        await client.emit('start_session')
+        await asyncio.wait_for(events['session_started'].wait(), 10)
+
+        block = int(sample_rate * frame_ms / 1000)
+        frames = len(signal) // block
+        seq = 0
+        started = time.monotonic()
+        # Paced against the start time so frames keep real-time rate without drift
+        while time.monotonic() - started < seconds:
+            offset = (seq % frames) * block
+            sent[seq] = time.monotonic()
+            await client.emit('audio_frame', encode_frame([signal[offset:offset + block]], seq, sample_rate))
+            results.frames_sent += 1
+            seq += 1
+            await asyncio.sleep(max(0.0, started + seq * frame_ms / 1000 - time.monotonic()))
+
+        stop_started = time.monotonic()
+        await client.emit('stop_session')
+        await asyncio.wait_for(events['session_stopped'].wait(), 120)
+        results.stop_seconds.append(time.monotonic() - stop_started)
+    except Exception as e:
+        results.errors.append(f"active session: {type(e).__name__}: {e}")
+    finally:
+        await client.disconnect()
+
+
+async def fetch_health(url):
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"{url}/health") as response:
+                return await response.json(content_type=None)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+async def main(args):
+    results = Results()
+    stop_idle = asyncio.Event()
+    signal = make_signal(args.signal, args.sample_rate)
+
+    # Idle clients first, in batches so the connect storm itself stays bounded
+    print(f"Connecting {args.idle} idle clients...")
+    idle_tasks = []
+    for i in range(0, args.idle, args.connect_batch):
+        batch = [asyncio.create_task(idle_client(args.url, results, stop_idle))
+                 for _ in range(min(args.connect_batch, args.idle - i))]
+        idle_tasks.extend(batch)
+        await asyncio.sleep(0.2)
+    while len(results.connect_seconds) + len(results.errors) < args.idle:
+        await asyncio.sleep(0.1)
+
+    print(f"Starting {args.active} active sessions for {args.seconds}s ({args.signal})...")
+    active_tasks = []
+    for _ in range(args.active):
+        active_tasks.append(asyncio.create_task(active_client(
+            args.url, results, args.seconds, signal, args.sample_rate, args.frame_ms)))
+        await asyncio.sleep(1.0 / max(1, args.active))  # spread session starts over a second
+
+    await asyncio.sleep(args.seconds / 2)
+    health = await fetch_health(args.url)
+    await asyncio.gather(*active_tasks)
+    stop_idle.set()
+    await asyncio.gather(*idle_tasks)
+
+    print("\n=== Load test results ===")
+    print(f"Clients: {args.idle} idle + {args.active} active, {args.seconds}s of audio each")
+    print(f"Connect:        {percentiles(results.connect_seconds)}")
+    print(f"Audio ack RTT:  {percentiles(results.ack_seconds)}  ({results.frames_sent} frames sent)")
+    print(f"Stop -> stopped: {percentiles(results.stop_seconds)}")
+    print(f"Transcripts received: {results.transcripts}   sessions rejected: {results.rejected}")
+    print(f"Errors: {len(results.errors)}")
+    for error in results.errors[:10]:
+        print(f"  {error}")
+    print("Server /health at mid-run:")
+    print(json.dumps({key: health.get(key) for key in ('sessions', 'event_loop_lag_ms', 'error') if key in health},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--idle', type=int, default=300, help='connected clients that never record')
+    parser.add_argument('--active', type=int, default=40, help='clients streaming audio in real time')
+    parser.add_argument('--seconds', type=float, default=60, help='audio streamed per active client')
+    parser.add_argument('--frame-ms', type=int, default=100, help='audio per binary frame')
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--signal', choices=('noise', 'tone'), default='tone')
+    parser.add_argument('--connect-batch', type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Split points from coarse to fine: paragraphs, lines, sentences, words
+SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def estimate_tokens(text):
+    """Rough token count for English text (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_text(text, max_tokens=3000, separators=SEPARATORS):
+    """Split text into chunks of at most ``max_tokens`` estimated tokens.
+
+    Cuts at the coarsest boundary that makes the pieces fit (paragraph, then
+    line, sentence, word) and packs neighbouring pieces back together, so
+    chunks end on natural boundaries and stay close to the budget.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text] if text.strip() else []
+    if not separators:
+        # No boundary left (e.g. one huge token): hard cut by characters
+        size = max_tokens * 4
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    separator, finer = separators[0], separators[1:]
+    pieces = []
+    for part in text.split(separator):
+        pieces.extend(split_text(part, max_tokens, finer) if estimate_tokens(part) > max_tokens else [part])
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if estimate_tokens(candidate) <= max_tokens:
+            current = candidate
+        else:
+            if current.strip():
+                chunks.append(current)
+            current = piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+class MapReduceAnalyzer:
+    """Analyze content of any length with a chat-completion function.
+
+    Content that fits one chunk goes straight to the final prompt (one call,
+    as before). Longer content is split on token-aware boundaries, each chunk
+    is condensed into notes concurrently (at most ``max_workers`` calls in
+    flight), notes are reduced in groups of ``fan_in`` until they fit one
+    prompt, and the final prompt runs on the combined notes.
+
+    ``complete(prompt, max_tokens, temperature)`` returns the model's text;
+    the optional ``stream`` takes the same arguments and yields text deltas,
+    which lets the final answer be shown as it is generated.
+    """
+
+    def __init__(self, complete, chunk_tokens=3000, max_workers=4, fan_in=6, notes_max_tokens=500, stream=None):
+        self.complete = complete
+        self.stream = stream
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.fan_in = fan_in
+        self.notes_max_tokens = notes_max_tokens
+        self.last_run = {}
+
+    def run(self, content, build_prompt, focus="the main facts, figures, themes and notable details",
+            max_tokens=1500, temperature=0.3, on_delta=None):
+        """Run the final prompt over the whole content.
+
+        ``build_prompt(text)`` returns the final prompt for the content (or the
+        combined notes on it); the text is passed in as an argument, never
+        substituted into an already filled-in prompt. With ``on_delta`` the
+        final answer is streamed to it piece by piece.
+        """
+        chunks = split_text(content, self.chunk_tokens)
+        self.last_run = {'chunks': len(chunks), 'reduce_rounds': 0}
+        if len(chunks) <= 1:
+            return self._final(build_prompt(content), max_tokens, temperature, on_delta)
+
+        # Map: condense every chunk concurrently
+        total = len(chunks)
+        notes = self._parallel([
+            f"This is part {i} of {total} of a larger document. Extract concise notes on {focus}. "
+            f"Keep concrete numbers and names.\n\n{chunk}"
+            for i, chunk in enumerate(chunks, 1)
+        ], temperature)
+
+        # Reduce: merge groups of notes until they fit a single prompt
+        while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > self.chunk_tokens:
+            groups = [notes[i:i + self.fan_in] for i in range(0, len(notes), self.fan_in)]
+            notes = self._parallel([
+                "Merge these notes on consecutive parts of one document into a single set of concise "
+                f"notes on {focus}. Keep concrete numbers and names.\n\n" + "\n\n".join(group)
+                for group in groups
+            ], temperature)
+            self.last_run['reduce_rounds'] += 1
+
+        combined = "\n\n".join(f"[Notes {i}] {note}" for i, note in enumerate(notes, 1))
+        return self._final(build_prompt(combined), max_tokens, temperature, on_delta)
+
+    def _final(self, prompt, max_tokens, temperature, on_delta):
+        if not (on_delta and self.stream):
+            return self.complete(prompt, max_tokens, temperature)
+        parts = []
+        for delta in self.stream(prompt, max_tokens, temperature):
+            parts.append(delta)
+            on_delta(delta)
+        return "".join(parts).strip()
+
+    def _parallel(self, prompts, temperature):
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prompts))) as executor:
+            return list(executor.map(
+                lambda prompt: self.complete(prompt, self.notes_max_tokens, temperature), prompts))
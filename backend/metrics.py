@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds (or ratio, for RTF); +Inf is implicit
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """A named metric family; ``labels(...)`` returns the child for one label combination"""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # an unlabelled metric is exported (as zero) before its first update
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values, **labels):
+        if labels:
+            values = tuple(labels[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) tuples for the exposition"""
+        for values, child in list(self._children.items()):
+            yield '', values, (), child.get()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, values, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} '
+                         f'{_format_value(value)}')
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class Counter(_Metric):
+    """Monotonic total (requests, tokens, errors)"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Current value. With ``set_function`` it is sampled only when /metrics is scraped,
+    so state that already lives elsewhere (session counts, queue depths) costs nothing
+    on the hot path. A labelled gauge's function returns {label value(s): value}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        super().__init__(name, help, labelnames, registry)
+        self._function = None
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            yield from super().samples()
+            return
+        try:
+            value = self._function()
+        except Exception as e:
+            print(f"Metrics: could not sample {self.name}: {e}")
+            return
+        if not self.labelnames:
+            yield '', (), (), value
+            return
+        for values, sample in value.items():
+            yield '', values if isinstance(values, tuple) else (values,), (), sample
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def get(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution in fixed buckets: one bisect and one locked increment per observation"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            counts, total = child.get()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', values, (('le', _format_value(float(bound))),), cumulative
+            yield '_sum', values, (), total
+            yield '_count', values, (), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Audio path: socket -> decode -> DSP/normalize -> ring buffer -> Whisper -> transcript
+AUDIO_CHUNK_SECONDS = Histogram(
+    'chaos_audio_chunk_seconds', 'Time to decode or normalize one incoming audio chunk/frame',
+    ['stage'], buckets=FAST_BUCKETS)
+AUDIO_BUFFER_WAIT_SECONDS = Histogram(
+    'chaos_audio_buffer_wait_seconds', 'Time a full window waits in the ring buffer before a worker takes it')
+TRANSCRIPTION_WINDOWS = Counter(
+    'chaos_transcription_windows_total', 'Windows taken by transcription workers', ['result'])
+WHISPER_INFERENCE_SECONDS = Histogram(
+    'chaos_whisper_inference_seconds', 'Whisper inference time per transcribed window', buckets=SLOW_BUCKETS)
+WHISPER_RTF = Histogram(
+    'chaos_whisper_real_time_factor', 'Inference seconds per second of window audio', buckets=RTF_BUCKETS)
+TRANSCRIPT_EMIT_SECONDS = Histogram(
+    'chaos_transcript_emit_latency_seconds', 'Time from a window becoming ready to its transcript being emitted',
+    buckets=SLOW_BUCKETS)
+
+# LLM calls
+LLM_REQUEST_SECONDS = Histogram(
+    'chaos_llm_request_seconds', 'LLM call latency (successful calls)', ['model', 'mode'], buckets=SLOW_BUCKETS)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    'chaos_llm_time_to_first_token_seconds', 'Time to the first streamed token', ['model'], buckets=SLOW_BUCKETS)
+LLM_TOKENS = Counter('chaos_llm_tokens_total', 'LLM tokens used (streams: completion estimated)', ['model', 'kind'])
+LLM_ERRORS = Counter('chaos_llm_errors_total', 'LLM calls that failed after retries', ['model'])
+LLM_RETRIES = Counter('chaos_llm_retries_total', 'LLM call attempts that were retried', ['model'])
+
+# Session lifecycle
+INSIGHT_JOB_SECONDS = Histogram(
+    'chaos_insight_job_seconds', 'Insight job run time, by outcome', ['status'], buckets=SLOW_BUCKETS)
+SESSION_SAVE_SECONDS = Histogram(
+    'chaos_session_save_seconds', 'Time to write a session file or index it in the archive', ['stage'])
+JOURNAL_SYNC_SECONDS = Histogram('chaos_journal_sync_seconds', 'Journal flush + fsync time')
+ARCHIVE_SEARCH_SECONDS = Histogram('chaos_archive_search_seconds', 'Session archive search time')
+
+# Sampled at scrape time (see set_function)
+SESSIONS = Gauge('chaos_sessions', 'Client sessions', ['state'])
+AUDIO_BUFFERED_SECONDS = Gauge('chaos_audio_buffered_seconds', 'Audio buffered across active sessions')
+AUDIO_BUFFER_FILL = Gauge('chaos_audio_buffer_fill_ratio', 'Ring buffer fill of the fullest active session')
+QUEUE_DEPTH = Gauge('chaos_queue_depth', 'Items waiting in each pipeline queue', ['queue'])
+INSIGHT_JOBS = Gauge('chaos_insight_jobs', 'Insight jobs by status', ['status'])
+EVENT_LOOP_LAG = Gauge('chaos_event_loop_lag_seconds', 'Last measured event-loop wake-up delay (asyncio server)')
+
+
+if __name__ == '__main__':
+    # Benchmark: cost of one observation on the hot path
+    rounds = 1000000
+    histogram = Histogram('bench_seconds', 'benchmark', registry=Registry())
+    child = histogram.labels()
+    started = time.perf_counter()
+    for i in range(rounds):
+        child.observe(i * 1e-6)
+    print(f"Histogram.observe: {(time.perf_counter() - started) / rounds * 1e9:.0f} ns")
+    counter = Counter('bench_total', 'benchmark', ['kind'], registry=Registry())
+    started = time.perf_counter()
+    for _ in range(rounds):
+        counter.labels('a').inc()
+    print(f"Counter.labels().inc: {(time.perf_counter() - started) / rounds * 1e9:.0f} ns")
+    started = time.perf_counter()
+    for _ in range(100):
+        REGISTRY.render()
+    print(f"Render {len(REGISTRY.metrics)} metrics: {(time.perf_counter() - started) * 10:.2f} ms")
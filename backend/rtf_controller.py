@@ -0,0 +1,123 @@
+from collections import deque
+from datetime import datetime
+
+
+class RealTimeController:
+    """Keeps live transcription inside a latency SLO.
+
+    After every window it measures the real-time factor (inference time over
+    window length) and the load (inference time over the hop, which must stay
+    below 1 to keep up). When the transcript falls behind it steps down a
+    ladder of cheaper settings: less overlap, then greedy decoding without
+    temperature fallback, then longer windows. When there is headroom again
+    it steps back up. If the backlog still exceeds ``max_backlog_seconds``,
+    the oldest audio is dropped and ``on_backpressure`` is told so that the
+    client can be warned. Every decision is kept for the session metadata.
+    ``greedy_options`` are the backend's greedy decode options (see
+    WhisperBackend.greedy_options).
+    """
+
+    def __init__(self, audio_processor, latency_slo_seconds=10, max_backlog_seconds=30,
+                 target_load=0.8, cooldown_windows=3, on_backpressure=None, greedy_options=None):
+        self.audio_processor = audio_processor
+        self.latency_slo = latency_slo_seconds
+        self.max_backlog = max_backlog_seconds
+        self.target_load = target_load
+        self.cooldown_windows = cooldown_windows
+        self.on_backpressure = on_backpressure
+
+        base_window = audio_processor.window_seconds
+        base_overlap = audio_processor.overlap
+        greedy = greedy_options or {'temperature': 0.0}
+        self.ladder = [
+            {'window_seconds': base_window, 'overlap': base_overlap, 'decode': {}},
+            {'window_seconds': base_window, 'overlap': min(base_overlap, 0.25), 'decode': {}},
+            {'window_seconds': base_window, 'overlap': 0.0, 'decode': {}},
+            {'window_seconds': base_window, 'overlap': 0.0, 'decode': greedy},
+            {'window_seconds': min(base_window * 2, 30), 'overlap': 0.0, 'decode': greedy},
+            {'window_seconds': min(base_window * 3, 30), 'overlap': 0.0, 'decode': greedy},
+        ]
+        self.level = 0
+        self.since_change = 0
+        self.rtf_ema = None
+        self.load_ema = None
+        self.dropped_seconds = 0.0
+        self.decisions = deque(maxlen=200)
+
+    @property
+    def decode_options(self):
+        """Extra Whisper decode options for the current level"""
+        return self.ladder[self.level]['decode']
+
+    def observe(self, window_seconds, hop_seconds, inference_seconds, latency_seconds):
+        """Record one transcribed window and adapt settings if needed"""
+        rtf = inference_seconds / window_seconds if window_seconds else 0.0
+        load = inference_seconds / hop_seconds if hop_seconds else 0.0
+        self.rtf_ema = rtf if self.rtf_ema is None else 0.7 * self.rtf_ema + 0.3 * rtf
+        self.load_ema = load if self.load_ema is None else 0.7 * self.load_ema + 0.3 * load
+        self.since_change += 1
+
+        backlog = len(self.audio_processor.audio_buffer) / self.audio_processor.sample_rate
+        if backlog > self.max_backlog:
+            self._drop_backlog(backlog)
+
+        if self.since_change < self.cooldown_windows:
+            return
+
+        behind = latency_seconds > self.latency_slo or self.load_ema > self.target_load
+        relaxed = latency_seconds < self.latency_slo / 2 and self.load_ema < self.target_load / 2
+        if behind and self.level < len(self.ladder) - 1:
+            self._set_level(self.level + 1, f"load {self.load_ema:.2f}, latency {latency_seconds:.1f}s")
+        elif relaxed and self.level > 0 and self.since_change >= 3 * self.cooldown_windows:
+            # Step back up more cautiously than we step down, to avoid oscillating
+            self._set_level(self.level - 1, f"headroom: load {self.load_ema:.2f}")
+
+    def _set_level(self, level, reason):
+        settings = self.ladder[level]
+        self.audio_processor.window_seconds = settings['window_seconds']
+        self.audio_processor.overlap = settings['overlap']
+        action = 'degrade' if level > self.level else 'restore'
+        self.level = level
+        self.since_change = 0
+        self._record(action, reason, window_seconds=settings['window_seconds'],
+                     overlap=settings['overlap'], decode=settings['decode'])
+        print(f"⚙️ RTF controller: {action} to level {level} ({reason})")
+
+    def _drop_backlog(self, backlog):
+        # Keep one window of the newest audio, drop the rest
+        keep = self.audio_processor.window_seconds
+        dropped = self.audio_processor.drop_oldest(backlog - keep)
+        self.dropped_seconds += dropped
+        self._record('drop_audio', f"backlog {backlog:.1f}s over {self.max_backlog}s",
+                     dropped_seconds=round(dropped, 2))
+        print(f"⚠️ Backpressure: dropped {dropped:.1f}s of buffered audio")
+        if self.on_backpressure:
+            self.on_backpressure({
+                'action': 'dropped_audio',
+                'dropped_seconds': round(dropped, 2),
+                'backlog_seconds': round(backlog, 2),
+                'message': 'Transcription is falling behind real time'
+            })
+
+    def _record(self, action, reason, **details):
+        self.decisions.append({
+            'time': datetime.now().isoformat(),
+            'action': action,
+            'reason': reason,
+            'level': self.level,
+            'rtf': round(self.rtf_ema, 3) if self.rtf_ema is not None else None,
+            **details
+        })
+
+    def report(self):
+        """Controller state and decision log for session metadata"""
+        return {
+            'level': self.level,
+            'settings': self.ladder[self.level],
+            'rtf_ema': round(self.rtf_ema, 3) if self.rtf_ema is not None else None,
+            'load_ema': round(self.load_ema, 3) if self.load_ema is not None else None,
+            'dropped_seconds': round(self.dropped_seconds, 2),
+            'overflow_dropped_seconds': round(
+                self.audio_processor.audio_buffer.dropped_samples / self.audio_processor.sample_rate, 2),
+            'decisions': list(self.decisions),
+        }
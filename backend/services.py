@@ -0,0 +1,215 @@
+"""Services shared by the Flask-SocketIO server (app.py) and the asyncio server (asgi_app.py).
+
+Importing this module only creates the cheap shared objects (LLM client, job
+manager, journal and archive handles). ``init()``, called once by each server's
+entry point, does the startup work: it sizes and loads the Whisper model (and
+its worker pool), recovers sessions that a previous process left unfinished in
+the journal and brings the search archive up to date with the saved session
+files.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+from audio_processor import AudioProcessor
+from transcription import TranscriptionService
+from insights import InsightsGenerator
+from calibration import choose_model
+from llm_client import get_client
+from insight_jobs import InsightJobManager
+from session_journal import JournalManager
+from session_archive import SessionArchive
+from metrics import (
+    SESSION_SAVE_SECONDS, SESSIONS, AUDIO_BUFFERED_SECONDS, AUDIO_BUFFER_FILL, QUEUE_DEPTH, INSIGHT_JOBS
+)
+from shared.config import Config
+
+# Shared LLM client for insights (pooled, rate-limited, retried; Groq's OpenAI-compatible API)
+llm_client = get_client(Config.API_KEY, Config.API_BASE_URL, Config.MODEL_NAME)
+
+# Initialize services
+def create_audio_processor():
+    """Per-session audio buffer and filter chain from Config"""
+    return AudioProcessor(
+        sample_rate=Config.AUDIO_SAMPLE_RATE,
+        chunk_size=Config.AUDIO_CHUNK_SIZE,
+        buffer_seconds=Config.AUDIO_BUFFER_SECONDS,
+        window_seconds=Config.TRANSCRIPTION_WINDOW_SECONDS,
+        overlap=Config.TRANSCRIPTION_OVERLAP,
+        lowpass_hz=Config.AUDIO_LOWPASS_HZ,
+        highpass_hz=Config.AUDIO_HIGHPASS_HZ,
+        gain_db=Config.AUDIO_GAIN_DB
+    )
+
+# Set by init()
+transcription_service = None
+
+
+def create_transcription_service():
+    """TranscriptionService from Config; with WHISPER_AUTOTUNE the model is first sized
+    to this host (result cached per CPU/thread count)"""
+    whisper_model = Config.WHISPER_MODEL
+    if Config.WHISPER_AUTOTUNE:
+        worker_threads = Config.WHISPER_THREADS_PER_WORKER
+        if not worker_threads and Config.WHISPER_WORKERS:
+            worker_threads = max(1, (os.cpu_count() or 1) // Config.WHISPER_WORKERS)
+        whisper_model = choose_model(
+            Config.WHISPER_CANDIDATE_MODELS,
+            backend=Config.WHISPER_BACKEND,
+            compute_type=Config.WHISPER_COMPUTE_TYPE or None,
+            threads=worker_threads,
+            target_rtf=Config.WHISPER_TARGET_RTF,
+            headroom=Config.WHISPER_RTF_HEADROOM,
+            fallback=Config.WHISPER_MODEL
+        )
+    
+    return TranscriptionService(
+        model_name=whisper_model,
+        backend=Config.WHISPER_BACKEND,
+        compute_type=Config.WHISPER_COMPUTE_TYPE or None,
+        sample_rate=Config.AUDIO_SAMPLE_RATE,
+        vad_enabled=Config.VAD_ENABLED,
+        vad_options={
+            'energy_margin_db': Config.VAD_ENERGY_MARGIN_DB,
+            'min_speech_seconds': Config.VAD_MIN_SPEECH_SECONDS
+        },
+        incremental=Config.TRANSCRIPTION_INCREMENTAL,
+        workers=Config.WHISPER_WORKERS,
+        threads_per_worker=Config.WHISPER_THREADS_PER_WORKER,
+        batch_size=Config.WHISPER_BATCH_SIZE,
+        batch_wait_ms=Config.WHISPER_BATCH_WAIT_MS,
+        rtf_control=Config.RTF_CONTROL_ENABLED,
+        rtf_options={
+            'latency_slo_seconds': Config.TRANSCRIPT_LATENCY_SLO_SECONDS,
+            'max_backlog_seconds': Config.MAX_AUDIO_BACKLOG_SECONDS
+        },
+        cache_enabled=Config.TRANSCRIPTION_CACHE_ENABLED,
+        cache_options={'max_bytes': int(Config.TRANSCRIPTION_CACHE_MB * 1024 * 1024)}
+    )
+
+def create_insights_generator():
+    """InsightsGenerator with the configured rolling-summary settings"""
+    return InsightsGenerator(
+        llm_client,
+        Config.MODEL_NAME,
+        rolling=Config.INSIGHTS_ROLLING,
+        summary_every_segments=Config.INSIGHTS_SUMMARY_EVERY_SEGMENTS,
+        summary_every_tokens=Config.INSIGHTS_SUMMARY_EVERY_TOKENS,
+        max_partials=Config.INSIGHTS_MAX_PARTIALS
+    )
+
+def save_session(session_data, session_id=None):
+    """Save session data to JSON file"""
+    try:
+        started = time.perf_counter()
+        # Create data directory if it doesn't exist
+        data_dir = SESSIONS_DIR
+        os.makedirs(data_dir, exist_ok=True)
+        
+        # Generate filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"session_{timestamp}_{session_id[:8]}.json" if session_id else f"session_{timestamp}.json"
+        filepath = os.path.join(data_dir, filename)
+        
+        # Save session data; written aside and renamed so a crash never leaves half a file
+        with open(filepath + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(session_data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(filepath + '.tmp', filepath)
+        SESSION_SAVE_SECONDS.labels('write').observe(time.perf_counter() - started)
+        
+        print(f"✅ Session saved to {filepath}")
+        
+    except Exception as e:
+        print(f"❌ Error saving session: {e}")
+        return None
+    
+    # Searchable right away; a failed index update is caught up by the next startup sync
+    try:
+        with SESSION_SAVE_SECONDS.labels('index').time():
+            session_archive.ingest(session_data, filepath, os.path.getmtime(filepath))
+    except Exception as e:
+        print(f"❌ Error indexing session: {e}")
+    return filepath
+
+
+# Final insights are generated in the background after stop and kept fetchable by job id
+insight_jobs = InsightJobManager(Config.INSIGHT_JOB_WORKERS, Config.INSIGHT_JOBS_KEPT)
+
+# Full-text index of saved sessions (backend/data/session_archive.db)
+SESSIONS_DIR = os.path.join(os.path.dirname(__file__), 'data', 'sessions')
+session_archive = SessionArchive()
+
+# Every live session is journaled as it happens; the session JSON is compacted from it
+journals = JournalManager(
+    os.path.join(os.path.dirname(__file__), 'data', 'journal'),
+    fsync_seconds=Config.SESSION_JOURNAL_FSYNC_SECONDS,
+    fsync_every=Config.SESSION_JOURNAL_FSYNC_RECORDS
+)
+
+
+def save_journal(journal):
+    """Compact a finished session's journal into its JSON file; the journal is removed once saved"""
+    session_data = journals.compact(journal)
+    filepath = save_session(session_data, journal.session_id)
+    if filepath:
+        journals.discard(journal)
+    return filepath
+
+
+def init():
+    """Startup work, run once per server process before it accepts clients (a second call is a no-op)"""
+    global transcription_service
+    if transcription_service is not None:
+        return
+    transcription_service = create_transcription_service()
+    
+    recovered = journals.recover(save_session)
+    if recovered:
+        print(f"♻️ Recovered {recovered} interrupted session(s) from the journal")
+    indexed = session_archive.sync_directory(SESSIONS_DIR)
+    if indexed:
+        print(f"🔎 Indexed {indexed} session file(s) into the archive")
+
+
+def register_metrics(session_manager, queue_depths=None):
+    """Point the scrape-time gauges in metrics at a server's sessions and the shared services.
+
+    ``queue_depths`` optionally returns the server's own queues ({name: depth}).
+    """
+    def active_processors():
+        return [session.audio_processor for session in list(session_manager.sessions.values()) if session.active]
+    
+    def queues():
+        depths = {
+            'transcription_windows': sum(processor.pending_windows() for processor in active_processors()),
+            'journal_records': journals.get_stats()['unsynced_records'],
+        }
+        if transcription_service and transcription_service.batcher:
+            depths['whisper_batch'] = transcription_service.batcher.queue.qsize()
+        if transcription_service and transcription_service.pool:
+            depths['whisper_pool_in_flight'] = transcription_service.pool.get_stats()['in_flight']
+        depths.update(queue_depths() if queue_depths else {})
+        return depths
+    
+    SESSIONS.set_function(lambda: {'connected': len(session_manager.sessions),
+                                   'active': session_manager.active_count()})
+    AUDIO_BUFFERED_SECONDS.set_function(lambda: sum(
+        len(processor.audio_buffer) / processor.sample_rate for processor in active_processors()))
+    AUDIO_BUFFER_FILL.set_function(lambda: max(
+        (len(processor.audio_buffer) / processor.audio_buffer.capacity for processor in active_processors()),
+        default=0.0))
+    QUEUE_DEPTH.set_function(queues)
+    INSIGHT_JOBS.set_function(lambda: {status: count for status, count in insight_jobs.get_stats().items()
+                                       if status != 'mean_seconds'})
+
+
+def resolve_recording(name):
+    """Absolute path of a recording inside BATCH_AUDIO_DIR, or None if it is outside or missing"""
+    audio_dir = os.path.realpath(os.path.join(os.path.dirname(__file__), Config.BATCH_AUDIO_DIR))
+    path = os.path.realpath(os.path.join(audio_dir, name))
+    if not path.startswith(audio_dir + os.sep) or not os.path.isfile(path):
+        return None
+    return path
@@ -0,0 +1,234 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from metrics import ARCHIVE_SEARCH_SECONDS
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'session_archive.db')
+
+
+def to_timestamp(value):
+    """Unix time from an ISO date/datetime string or a number; None passes through"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def match_query(text):
+    """Free text to an FTS5 query: every word must match, a trailing * keeps prefix search"""
+    terms = re.findall(r"[\w']+\*?", text)
+    return " ".join(f'"{term.rstrip("*")}"*' if term.endswith('*') else f'"{term}"' for term in terms)
+
+
+class SessionArchive:
+    """Searchable index of saved sessions (SQLite FTS5).
+
+    One row per session holds its time range and insights; its transcript
+    and insight text are indexed together in an FTS5 table (Porter-stemmed),
+    so search is ranked by BM25 with insights weighted above transcript
+    text. Time filters use an index on the start time. The JSON files stay
+    the source of truth; the archive can be rebuilt from them at any time.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, insights_weight=2.0):
+        self.insights_weight = insights_weight
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                session_key TEXT UNIQUE NOT NULL,
+                file TEXT,
+                file_mtime REAL,
+                started REAL,
+                ended REAL,
+                segments INTEGER NOT NULL,
+                source_file TEXT,
+                recovered INTEGER NOT NULL DEFAULT 0,
+                insights TEXT
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_file ON sessions (file)')
+        self.conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS session_text
+            USING fts5(transcript, insights, tokenize='porter unicode61')
+        ''')
+        self.conn.commit()
+
+    def ingest(self, session_data, file=None, file_mtime=None, commit=True):
+        """Index (or re-index) one session dict as written by save_session"""
+        parts = session_data.get('transcript_parts') or []
+        transcript = " ".join(part.get('text', '') for part in parts)
+        insights = (session_data.get('insights') or {}).get('insights') or []
+        # Older files have no session id or start time: key by file name, start at the first segment
+        key = session_data.get('session_id') or os.path.basename(file or '') or None
+        if key is None:
+            raise ValueError("session has neither a session_id nor a file name")
+        first_timestamp = parts[0].get('timestamp') if parts and isinstance(parts[0].get('timestamp'), str) else None
+        started = to_timestamp(session_data.get('session_started') or first_timestamp or session_data.get('session_ended'))
+        ended = to_timestamp(session_data.get('session_ended'))
+
+        row = (file and os.path.basename(file), file_mtime, started, ended, len(parts),
+               session_data.get('source_file'), int(bool(session_data.get('recovered'))), json.dumps(insights))
+        with self._lock:
+            existing = self.conn.execute('SELECT id FROM sessions WHERE session_key = ?', (key,)).fetchone()
+            if existing:
+                rowid = existing[0]
+                self.conn.execute(
+                    'UPDATE sessions SET file = ?, file_mtime = ?, started = ?, ended = ?, segments = ?, '
+                    'source_file = ?, recovered = ?, insights = ? WHERE id = ?', row + (rowid,))
+                self.conn.execute('DELETE FROM session_text WHERE rowid = ?', (rowid,))
+            else:
+                rowid = self.conn.execute(
+                    'INSERT INTO sessions (session_key, file, file_mtime, started, ended, segments, '
+                    'source_file, recovered, insights) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (key,) + row).lastrowid
+            self.conn.execute('INSERT INTO session_text (rowid, transcript, insights) VALUES (?, ?, ?)',
+                              (rowid, transcript, "\n".join(insights)))
+            if commit:
+                self.conn.commit()
+        return key
+
+    def sync_directory(self, directory):
+        """Index session files that are new or changed since the last sync; returns how many"""
+        with self._lock:
+            known = dict(self.conn.execute('SELECT file, file_mtime FROM sessions WHERE file IS NOT NULL'))
+        ingested = 0
+        for path in glob.glob(os.path.join(directory, 'session_*.json')):
+            mtime = os.path.getmtime(path)
+            if known.get(os.path.basename(path)) == mtime:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.ingest(json.load(f), path, mtime, commit=False)
+                ingested += 1
+            except (OSError, ValueError) as e:
+                print(f"❌ Could not index {path}: {e}")
+        with self._lock:
+            self.conn.commit()
+        return ingested
+
+    def search(self, query="", start=None, end=None, limit=20, offset=0):
+        """Ranked full-text search over sessions, optionally within [start, end].
+
+        ``query`` is free text (all words must match, ``word*`` for prefixes);
+        an empty query lists sessions in the range, newest first. ``start``
+        and ``end`` are ISO dates/datetimes or Unix times.
+        """
+        started = time.perf_counter()
+        filters, params = [], []
+        if start is not None and start != '':
+            filters.append('s.started >= ?')
+            params.append(to_timestamp(start))
+        if end is not None and end != '':
+            filters.append('s.started <= ?')
+            params.append(to_timestamp(end))
+        limit = max(1, min(int(limit), 100))
+        columns = ('s.session_key, s.file, s.started, s.ended, s.segments, s.source_file, s.recovered, '
+                   's.insights')
+
+        fts_query = match_query(query or "")
+        with self._lock:
+            if fts_query:
+                where = " AND ".join(['session_text MATCH ?'] + filters)
+                rows = self.conn.execute(
+                    f'SELECT {columns}, bm25(session_text, 1.0, ?) AS score, '
+                    f"snippet(session_text, -1, '[', ']', ' … ', 24) "
+                    f'FROM session_text JOIN sessions s ON s.id = session_text.rowid '
+                    f'WHERE {where} ORDER BY score LIMIT ? OFFSET ?',
+                    [self.insights_weight, fts_query] + params + [limit, int(offset)]
+                ).fetchall()
+                total = self.conn.execute(
+                    f'SELECT COUNT(*) FROM session_text JOIN sessions s ON s.id = session_text.rowid WHERE {where}',
+                    [fts_query] + params
+                ).fetchone()[0]
+            else:
+                where = f"WHERE {' AND '.join(filters)}" if filters else ""
+                rows = self.conn.execute(
+                    f'SELECT {columns}, NULL, NULL FROM sessions s {where} ORDER BY s.started DESC LIMIT ? OFFSET ?',
+                    params + [limit, int(offset)]
+                ).fetchall()
+                total = self.conn.execute(f'SELECT COUNT(*) FROM sessions s {where}', params).fetchone()[0]
+
+        results = [
+            {
+                'session_id': key,
+                'file': file,
+                'started': datetime.fromtimestamp(started_at).isoformat() if started_at else None,
+                'ended': datetime.fromtimestamp(ended_at).isoformat() if ended_at else None,
+                'segments': segments,
+                'source_file': source_file,
+                'recovered': bool(recovered),
+                'insights': json.loads(insights) if insights else [],
+                'score': round(-score, 3) if score is not None else None,  # bm25: lower is better
+                'snippet': snippet,
+            }
+            for key, file, started_at, ended_at, segments, source_file, recovered, insights, score, snippet in rows
+        ]
+        took = time.perf_counter() - started
+        ARCHIVE_SEARCH_SECONDS.observe(took)
+        return {
+            'query': query,
+            'total': total,
+            'results': results,
+            'took_ms': round(took * 1000, 2),
+        }
+
+    def get_stats(self):
+        with self._lock:
+            return {'sessions': self.conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+if __name__ == '__main__':
+    # Benchmark: search latency over a synthetic archive of many sessions
+    import random
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(5000)] + [
+        "budget", "roadmap", "hiring", "launch", "customer", "latency", "migration", "pricing", "security"]
+    archive = SessionArchive(':memory:')
+    day = 24 * 3600
+    t0 = time.perf_counter()
+    for i in range(count):
+        started_at = 1.7e9 + i * day / 10
+        parts = [{'text': " ".join(rng.choices(vocabulary, k=12)), 'timestamp': ''} for _ in range(60)]
+        archive.ingest({
+            'session_id': f"bench{i}",
+            'session_started': datetime.fromtimestamp(started_at).isoformat(),
+            'session_ended': datetime.fromtimestamp(started_at + 3600).isoformat(),
+            'transcript_parts': parts,
+            'insights': {'insights': [" ".join(rng.choices(vocabulary, k=10)) for _ in range(5)]},
+        }, commit=False)
+    archive.conn.commit()
+    print(f"Indexed {count} sessions ({count * 60} segments) in {time.perf_counter() - t0:.1f}s")
+
+    middle = datetime.fromtimestamp(1.7e9 + count * day / 20).isoformat()
+    for query, start in [("budget", None), ("budget roadmap", None), ("word12", None),
+                         ("migration secur*", None), ("pricing", middle), ("", middle)]:
+        timings = []
+        for _ in range(5):
+            response = archive.search(query, start=start)
+            timings.append(response['took_ms'])
+        print(f"{query or '(browse)'!r:>22} start={bool(start)!s:5}: {response['total']:6d} hits, "
+              f"median {sorted(timings)[2]:.1f} ms")
@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from metrics import JOURNAL_SYNC_SECONDS
+
+
+class SessionJournal:
+    """Append-only JSONL record of one recording session.
+
+    Each transcript segment, insight result and session event is one line,
+    written as it happens. Appends only go to the file buffer; the
+    JournalManager's flusher thread flushes and fsyncs in batches, so no
+    caller (including the asyncio server's event loop) waits on the disk.
+    """
+
+    def __init__(self, manager, session_id, path):
+        self.manager = manager
+        self.session_id = session_id
+        self.path = path
+        self.records = 0
+        self.unsynced = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, record_type, **fields):
+        line = json.dumps({'type': record_type, 'time': datetime.now().isoformat(), **fields},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.records += 1
+            self.unsynced += 1
+            unsynced = self.unsynced
+        if unsynced >= self.manager.fsync_every:
+            self.manager.request_sync()
+
+    def sync(self):
+        """Flush and fsync pending records; returns True if anything was written"""
+        with self._lock:
+            if self._file is None or not self.unsynced:
+                return False
+            started = time.perf_counter()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            JOURNAL_SYNC_SECONDS.observe(time.perf_counter() - started)
+            self.unsynced = 0
+            return True
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_journal(path):
+    """Fold a journal into the session dict that save_session writes.
+
+    A torn last line (crash mid-write) is skipped. A journal without a
+    session_end record is marked ``recovered`` and ends at its last record.
+    """
+    data = {
+        'session_id': None,
+        'session_started': None,
+        'transcript_parts': [],
+        'events': [],
+        'insights': None,
+        'transcription_stats': None,
+        'session_ended': None,
+    }
+    last_time = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            record_type = record.pop('type', None)
+            last_time = record.pop('time', last_time)
+            if record_type in ('session_start', 'session_end'):
+                data.update(record)
+            elif record_type == 'transcript':
+                data['transcript_parts'].append(record)
+            elif record_type == 'insights':
+                data['insights'] = record.get('insights')
+            else:
+                data['events'].append({'type': record_type, 'time': last_time, **record})
+    if data['session_ended'] is None:
+        data['session_ended'] = last_time
+        data['recovered'] = True
+    return data
+
+
+class JournalManager:
+    """Opens per-session journals in ``directory`` and fsyncs them in batches.
+
+    A background thread syncs every journal with pending records each
+    ``fsync_seconds``, or sooner once one has ``fsync_every`` unsynced
+    records. At most ``fsync_seconds`` of records can be lost in a crash.
+    """
+
+    def __init__(self, directory, fsync_seconds=1.0, fsync_every=64):
+        self.directory = directory
+        self.fsync_seconds = fsync_seconds
+        self.fsync_every = fsync_every
+        self.journals = {}
+        self.syncs = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def open(self, session_id, **fields):
+        """Start a journal for a session; ``fields`` go into its session_start record"""
+        journal = SessionJournal(self, session_id, os.path.join(self.directory, f"{session_id}.jsonl"))
+        with self._lock:
+            self.journals[session_id] = journal
+        journal.append('session_start', session_id=session_id, **fields)
+        return journal
+
+    def request_sync(self):
+        self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.fsync_seconds)
+            self._wake.clear()
+            with self._lock:
+                journals = list(self.journals.values())
+            for journal in journals:
+                try:
+                    if journal.sync():
+                        self.syncs += 1
+                except (OSError, ValueError) as e:
+                    print(f"Journal sync error for {journal.session_id}: {e}")
+
+    def compact(self, journal):
+        """Close a finished session's journal and return it as a session dict"""
+        journal.close()
+        with self._lock:
+            self.journals.pop(journal.session_id, None)
+        return read_journal(journal.path)
+
+    def discard(self, journal):
+        """Delete a journal once its compacted JSON is safely written"""
+        try:
+            os.remove(journal.path)
+        except FileNotFoundError:
+            pass
+
+    def recover(self, save):
+        """Compact journals left by a previous process (crash or kill) with ``save(data, session_id)``.
+
+        Meant for startup, before any session is open. A journal is deleted
+        only when ``save`` returns a truthy value. Returns the number recovered.
+        """
+        recovered = 0
+        with self._lock:
+            open_paths = {journal.path for journal in self.journals.values()}
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.jsonl'))):
+            if path in open_paths:
+                continue
+            try:
+                data = read_journal(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"❌ Could not read journal {path}: {e}")
+                continue
+            data['recovered'] = True
+            if save(data, data.get('session_id')):
+                os.remove(path)
+                recovered += 1
+        return recovered
+
+    def get_stats(self):
+        with self._lock:
+            journals = list(self.journals.values())
+        return {
+            'open': len(journals),
+            'unsynced_records': sum(journal.unsynced for journal in journals),
+            'syncs': self.syncs,
+        }
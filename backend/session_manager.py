@@ -0,0 +1,103 @@
+import threading
+import uuid
+from datetime import datetime
+
+
+class SessionCapacityError(RuntimeError):
+    """Raised when starting a session would exceed the concurrent-session cap"""
+
+
+class Session:
+    """State of one connected client: audio buffer, transcript and insights.
+
+    The AudioProcessor (the large allocation) is only created when the client
+    first starts recording, so idle connections stay cheap.
+    """
+
+    def __init__(self, sid, create_audio_processor, create_insights_generator):
+        self.sid = sid
+        self.room = sid  # every Socket.IO client is in a room named after its sid
+        self.id = uuid.uuid4().hex
+        self._create_audio_processor = create_audio_processor
+        self._audio_processor = None
+        self._create_insights_generator = create_insights_generator
+        self.insights_generator = create_insights_generator()
+        self.active = False
+        self.start_time = None
+        self.transcript_parts = []
+        self.transport = None   # negotiated audio transport: {'transport', 'next_seq'}
+        self.worker = None      # TranscriptionWorker while recording
+        self.pipeline = None    # asgi_app.AudioPipeline while recording on the asyncio server
+        self.journal = None     # SessionJournal while recording
+        self.connected_at = datetime.now()
+
+    @property
+    def audio_processor(self):
+        if self._audio_processor is None:
+            self._audio_processor = self._create_audio_processor()
+        return self._audio_processor
+
+    def take_insights_generator(self):
+        """Hand the current generator to a background job; the session gets a fresh one"""
+        generator = self.insights_generator
+        self.insights_generator = self._create_insights_generator()
+        return generator
+
+
+class SessionManager:
+    """Registry of client sessions keyed by Socket.IO sid.
+
+    Sessions share the expensive pieces (Whisper model, worker pool, LLM
+    client) through the factories; each gets its own buffers and state.
+    At most ``max_sessions`` may record at the same time.
+    """
+
+    def __init__(self, create_audio_processor, create_insights_generator, max_sessions=8):
+        self.create_audio_processor = create_audio_processor
+        self.create_insights_generator = create_insights_generator
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def connect(self, sid):
+        with self._lock:
+            session = self.sessions.get(sid)
+            if session is None:
+                session = Session(sid, self.create_audio_processor, self.create_insights_generator)
+                self.sessions[sid] = session
+            return session
+
+    def get(self, sid):
+        return self.sessions.get(sid)
+
+    def start(self, session):
+        """Mark a session as recording, enforcing the concurrent-session cap"""
+        with self._lock:
+            if not session.active and self.active_count() >= self.max_sessions:
+                self.rejected += 1
+                raise SessionCapacityError(
+                    f"Server is at capacity ({self.max_sessions} active sessions), try again later")
+            session.active = True
+            session.id = uuid.uuid4().hex  # each recording is its own session
+            session.start_time = datetime.now()
+            session.transcript_parts = []
+
+    def disconnect(self, sid):
+        """Drop a session; the caller stops its transcription worker if any"""
+        with self._lock:
+            session = self.sessions.pop(sid, None)
+        if session:
+            session.active = False
+        return session
+
+    def active_count(self):
+        return sum(1 for session in list(self.sessions.values()) if session.active)
+
+    def get_stats(self):
+        return {
+            'connected': len(self.sessions),
+            'active': self.active_count(),
+            'max_active': self.max_sessions,
+            'rejected': self.rejected,
+        }
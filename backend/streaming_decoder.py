@@ -0,0 +1,76 @@
+import re
+from collections import namedtuple
+
+# A decoded word with absolute stream times in seconds
+Word = namedtuple('Word', ['start', 'end', 'text'])
+
+_PUNCTUATION = re.compile(r"[^\w']+")
+
+
+def _normalize(text):
+    return _PUNCTUATION.sub('', text.lower())
+
+
+class IncrementalDecoder:
+    """Stitches overlapping window transcripts into text that is emitted once.
+
+    Each window's words arrive with absolute timestamps. Words inside the
+    already-committed span are dropped. The remainder is committed when the
+    next window can no longer revise it (it ends before that window starts)
+    or when two consecutive hypotheses agree on it (local agreement). The
+    rest stays pending until the next window confirms or replaces it.
+    """
+
+    def __init__(self, prompt_chars=200, tolerance=0.15):
+        self.prompt_chars = prompt_chars
+        self.tolerance = tolerance
+        self.reset()
+
+    def reset(self):
+        self.committed_tail = ""
+        self.committed_end = 0.0
+        self.last_committed = None
+        self.pending = []
+
+    def prompt(self):
+        """Tail of the committed text, for Whisper's initial_prompt"""
+        return self.committed_tail.strip() or None
+
+    def update(self, words, next_window_start):
+        """Feed one window's words; returns the newly committed text (may be empty)"""
+        fresh = [w for w in words if (w.start + w.end) / 2 > self.committed_end]
+
+        # Boundary word re-recognised with slightly shifted timestamps
+        if (fresh and self.last_committed is not None
+                and _normalize(fresh[0].text) == _normalize(self.last_committed.text)
+                and fresh[0].start < self.last_committed.end + self.tolerance):
+            fresh = fresh[1:]
+
+        agreed = 0
+        for previous, current in zip(self.pending, fresh):
+            if _normalize(previous.text) != _normalize(current.text):
+                break
+            agreed += 1
+
+        # Words that end before the next window starts will not be seen again
+        final = agreed
+        while final < len(fresh) and fresh[final].end <= next_window_start:
+            final += 1
+
+        self.pending = fresh[final:]
+        return self._commit(fresh[:final])
+
+    def flush(self):
+        """Commit whatever is still pending (end of stream or a skipped window)"""
+        words, self.pending = self.pending, []
+        return self._commit(words)
+
+    def _commit(self, words):
+        if not words:
+            return ""
+        text = "".join(w.text for w in words).strip()
+        # Only the tail is kept; it is all the prompt needs
+        self.committed_tail = f"{self.committed_tail} {text}"[-self.prompt_chars:]
+        self.committed_end = words[-1].end
+        self.last_committed = words[-1]
+        return text
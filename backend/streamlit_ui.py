@@ -0,0 +1,56 @@
+"""Helpers shared by the Streamlit apps (chaosharvester.py, webharvester.py).
+
+Import this module first: it puts the repository root on sys.path so that
+``shared.config`` resolves when an app is started with
+``streamlit run backend/<app>.py``.
+"""
+import sys
+import os
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+import time
+
+import streamlit as st
+
+
+def stream_to(placeholder):
+    """on_delta callback rendering streamed text into a Streamlit placeholder.
+
+    The callback's ``first_token_seconds`` is the time from creating it (the
+    user's click) to the first token, including any map-reduce condensing
+    before the streamed answer; show it with ``show_first_token``.
+    """
+    started = time.monotonic()
+    parts = []
+
+    def on_delta(delta):
+        if not parts:
+            on_delta.first_token_seconds = time.monotonic() - started
+        parts.append(delta)
+        placeholder.markdown("".join(parts))
+
+    on_delta.first_token_seconds = None
+    return on_delta
+
+
+def show_first_token(on_delta):
+    """Caption under streamed output with the time the user waited for its first token"""
+    if on_delta.first_token_seconds is not None:
+        st.caption(f"First token after {on_delta.first_token_seconds:.2f}s")
+
+
+def show_llm_latency(llm, model):
+    """Sidebar note with the LLM client's time to first token and latency (p50/p95)"""
+    metrics = llm.get_metrics().get(model)
+    if not metrics or not metrics['requests']:
+        return
+    st.sidebar.caption(
+        f"LLM: {metrics['requests']} calls · first token p50 "
+        f"{metrics['time_to_first_token_p50_seconds']}s / p95 {metrics['time_to_first_token_p95_seconds']}s · "
+        f"latency p50 {metrics['latency_p50_seconds']}s / p95 {metrics['latency_p95_seconds']}s"
+    )
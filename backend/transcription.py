@@ -1,4 +1,3 @@
-import whisper
 import io
 import threading
 import time
@@ -6,53 +5,164 @@ import numpy as np
 import tempfile
 import os
 import wave
+from collections import deque
+from functools import partial
 from queue import Queue
 
+from vad import VoiceActivityDetector
+from streaming_decoder import IncrementalDecoder, Word
+from worker_pool import WhisperWorkerPool, can_fork
+from batching import BatchScheduler, MAX_BATCH_SECONDS
+from whisper_backends import backend_class, load_backend
+from rtf_controller import RealTimeController
+from audio_file import open_audio, split_at_silence, read_chunk
+from transcription_cache import TranscriptionCache, compact_result
+from metrics import (
+    TRANSCRIPTION_WINDOWS, WHISPER_INFERENCE_SECONDS, WHISPER_RTF, TRANSCRIPT_EMIT_SECONDS
+)
+
+WINDOWS_TRANSCRIBED = TRANSCRIPTION_WINDOWS.labels('transcribed')
+WINDOWS_SKIPPED = TRANSCRIPTION_WINDOWS.labels('vad_skipped')
+
 class TranscriptionService:
-    def __init__(self, model_name="base"):
-        print("Loading Whisper model...")
-        self.model = whisper.load_model(model_name)
+    def __init__(self, model_name="base", sample_rate=16000, vad_enabled=True, vad_options=None,
+                 incremental=True, workers=0, threads_per_worker=0, batch_size=1, batch_wait_ms=50,
+                 backend="openai", compute_type=None, rtf_control=True, rtf_options=None,
+                 cache_enabled=False, cache_options=None):
+        # Pluggable inference backend (fp32 PyTorch, int8-quantized PyTorch, faster-whisper).
+        # Loaded here unless every inference runs in spawned pool workers, which load their own
+        backend_cls = backend_class(backend)
+        self.backend = None
+        if workers <= 0 or can_fork(backend_cls):
+            self.backend = load_backend(backend, model_name, compute_type)
+        # Content-addressed result cache: identical audio is never transcribed twice
+        self.cache = None
+        if cache_enabled:
+            model_id = f"{backend}|{model_name}|{backend_cls.resolve_compute_type(compute_type)}"
+            self.cache = TranscriptionCache(model_id=model_id, **(cache_options or {}))
+        # Optional process pool: inference leaves the Socket.IO process (and its GIL)
+        self.pool = None
+        if workers > 0:
+            self.pool = WhisperWorkerPool(self.backend, workers, threads_per_worker,
+                                          model_loader=partial(load_backend, backend, model_name, compute_type))
+        # Optional batching of concurrently ready windows (text-only decoding)
+        self.batcher = None
+        if batch_size > 1:
+            self.batcher = BatchScheduler(self.infer_batch, batch_size, batch_wait_ms)
         self.transcription_queue = Queue()
-        self.running = False
+        self.sample_rate = sample_rate
+        # Voice-activity gate in front of Whisper; each session gets its own detector
+        self.vad_enabled = vad_enabled
+        self.vad_options = vad_options or {}
+        # Overlap-aware decoding: emit only words not already committed
+        self.incremental = incremental
+        # Per-session real-time-factor controller (window/overlap/decode adaptation, backpressure)
+        self.rtf_control = rtf_control
+        self.rtf_options = rtf_options or {}
+        self.greedy_options = backend_cls.greedy_options
+        # One worker per recording session; self.worker is the most recently started
+        self.workers = set()
+        self.worker = None
         
-    def transcribe_audio(self, audio_bytes):
-        """Transcribe audio bytes to text using NumPy array (avoids temp file issues)"""
+    def transcribe_audio(self, audio, initial_prompt=None, decode_options=None):
+        """Transcribe float32 samples (or, for compatibility, WAV bytes) to text"""
         try:
-            # Convert BytesIO to numpy array
-            if isinstance(audio_bytes, bytes):
-                audio_file = io.BytesIO(audio_bytes)
-            else:
-                audio_file = audio_bytes
-                
-            # Reset file pointer
-            audio_file.seek(0)
-            
-            # Read WAV data and convert to numpy array
-            with wave.open(audio_file, 'rb') as wav_file:
-                framerate = wav_file.getframerate()
-                frames = wav_file.readframes(wav_file.getnframes())
-                
-            # Convert to numpy array
-            audio_np = np.frombuffer(frames, dtype=np.int16).astype(np.float32)
-            
-            # Normalize to [-1, 1] range
-            audio_np = audio_np / 32768.0
-            
-            # Transcribe using numpy array (no temp files needed)
-            result = self.model.transcribe(
-                audio_np,
-                language="en", 
-                task="transcribe",
-                fp16=False,
-                verbose=False
-            )
-            
+            audio_np = self.as_float32(audio)
+            if self.can_batch(audio_np, initial_prompt):
+                return self.batcher.transcribe(audio_np, decode_options)
+            result = self.run_model(audio_np, initial_prompt=initial_prompt, **(decode_options or {}))
             return result["text"].strip()
             
         except Exception as e:
             print(f"Transcription error: {e}")
             return ""
     
+    def transcribe_words(self, audio, offset_seconds=0.0, initial_prompt=None, decode_options=None):
+        """Transcribe with word timestamps; returns Words shifted by offset_seconds"""
+        try:
+            result = self.run_model(self.as_float32(audio), initial_prompt=initial_prompt,
+                                    word_timestamps=True, **(decode_options or {}))
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            return []
+        
+        return [
+            Word(word["start"] + offset_seconds, word["end"] + offset_seconds, word["word"])
+            for segment in result.get("segments", [])
+            for word in segment.get("words", [])
+        ]
+    
+    def run_model(self, audio_np, **options):
+        """Run Whisper on a float32 array (no temp files needed)"""
+        options = dict(language="en", task="transcribe", fp16=False, verbose=False, **options)
+        key = None
+        if self.cache:
+            key = self.cache.key(audio_np, options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        if self.pool:
+            result = self.pool.transcribe(audio_np, **options)
+        else:
+            result = self.backend.transcribe(audio_np, **options)
+        if key:
+            self.cache.put(key, compact_result(result))
+        return result
+    
+    def can_batch(self, audio_np, initial_prompt=None):
+        """Batched decoding handles single-segment windows without prompts or word timestamps"""
+        return (self.batcher is not None and initial_prompt is None
+                and len(audio_np) <= MAX_BATCH_SECONDS * self.sample_rate)
+    
+    def infer_batch(self, arrays, decode_options=None):
+        """Decode a list of windows in one batched pass; returns one text per window"""
+        options = dict(language="en", fp16=False, **(decode_options or {}))
+        texts = [None] * len(arrays)
+        keys = [None] * len(arrays)
+        if self.cache:
+            for i, audio in enumerate(arrays):
+                keys[i] = self.cache.key(audio, dict(options, without_timestamps=True))
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    texts[i] = cached['text']
+        
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            pending = [arrays[i] for i in missing]
+            if self.pool:
+                decoded = self.pool.submit(pending, options, method='decode_batch').get()
+            else:
+                decoded = self.backend.decode_batch(pending, **options)
+            for i, text in zip(missing, decoded):
+                texts[i] = text
+                if keys[i]:
+                    self.cache.put(keys[i], {'text': text})
+        return texts
+    
+    def as_float32(self, audio):
+        """In-process handoff: arrays pass through, WAV bytes are decoded"""
+        if isinstance(audio, np.ndarray):
+            return audio if audio.dtype == np.float32 else audio.astype(np.float32)
+        return self.wav_to_array(audio)
+    
+    def wav_to_array(self, audio_bytes):
+        """Decode 16-bit WAV bytes (or a BytesIO) into float32 samples in [-1, 1]"""
+        if isinstance(audio_bytes, bytes):
+            audio_file = io.BytesIO(audio_bytes)
+        else:
+            audio_file = audio_bytes
+            
+        # Reset file pointer
+        audio_file.seek(0)
+        
+        # Read WAV data and convert to numpy array
+        with wave.open(audio_file, 'rb') as wav_file:
+            frames = wav_file.readframes(wav_file.getnframes())
+        
+        # Normalize to [-1, 1] range
+        return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    
     def transcribe_audio_fallback(self, audio_bytes):
         """Fallback method using temp files with proper cleanup"""
         try:
@@ -73,7 +183,7 @@ class TranscriptionService:
             
             # Transcribe after the file is properly closed
             try:
-                result = self.model.transcribe(
+                result = (self.pool or self.backend).transcribe(
                     temp_filename,
                     language="en",
                     task="transcribe",
@@ -99,49 +209,191 @@ class TranscriptionService:
             print(f"Transcription error: {e}")
             return ""
     
-    def start_continuous_transcription(self, audio_processor, callback):
-        """Start continuous transcription in a separate thread"""
-        self.running = True
+    def transcribe_file(self, path, progress_callback=None, chunk_seconds=MAX_BATCH_SECONDS):
+        """Transcribe a recorded WAV/PCM file faster than real time.
+        
+        The file is memory-mapped and cut at quiet points into chunks of at most
+        ``chunk_seconds``. With a worker pool the chunks run in parallel (two per
+        process in flight, so memory stays bounded); silent chunks are skipped.
+        Segment times are shifted back to file time and stitched in order.
+        """
+        started = time.monotonic()
+        frames, file_rate = open_audio(path, self.sample_rate)
+        chunks = split_at_silence(frames, file_rate, chunk_seconds)
+        duration = len(frames) / file_rate
+        vad = VoiceActivityDetector(self.sample_rate, **self.vad_options) if self.vad_enabled else None
+        # Chunks are independent, so no conditioning on (possibly missing) previous text
+        options = dict(language="en", task="transcribe", fp16=False, verbose=None,
+                       condition_on_previous_text=False)
+        
+        results = [[] for _ in chunks]
+        stats = {'done': 0, 'skipped': 0, 'failed': 0, 'audio_seconds': 0.0}
+        
+        def chunk_done(index, offset, result, error=None):
+            if error is not None:
+                print(f"Transcription error in chunk {index}: {error}")
+                stats['failed'] += 1
+            elif result is None:
+                stats['skipped'] += 1
+            else:
+                results[index] = [
+                    {'start': round(segment['start'] + offset, 2),
+                     'end': round(segment['end'] + offset, 2),
+                     'text': segment['text'].strip()}
+                    for segment in result.get('segments', []) if segment['text'].strip()
+                ]
+            start, end = chunks[index]
+            stats['done'] += 1
+            stats['audio_seconds'] += (end - start) / file_rate
+            if progress_callback:
+                elapsed = time.monotonic() - started
+                progress_callback({
+                    'chunks_done': stats['done'],
+                    'chunks_total': len(chunks),
+                    'audio_seconds_done': round(stats['audio_seconds'], 1),
+                    'duration_seconds': round(duration, 1),
+                    'elapsed_seconds': round(elapsed, 1),
+                    'speed': round(stats['audio_seconds'] / elapsed, 2) if elapsed else None,
+                })
         
-        def transcription_worker():
-            while self.running:
+        in_flight = deque()
+        max_in_flight = 2 * self.pool.processes if self.pool else 1
+        for index, (start, end) in enumerate(chunks):
+            audio = read_chunk(frames, start, end, file_rate, self.sample_rate)
+            offset = start / file_rate
+            if vad:
+                speech = vad.gate(audio)
+                if speech is None:
+                    chunk_done(index, offset, None)
+                    continue
+                audio = audio[speech[0]:speech[1]]
+                offset += speech[0] / self.sample_rate
+            
+            key = self.cache.key(audio, options) if self.cache else None
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                chunk_done(index, offset, cached)
+                continue
+            
+            if not self.pool:
                 try:
-                    # Get audio chunk for transcription
-                    audio_data = audio_processor.get_audio_for_transcription()
-                    
-                    if audio_data:
-                        # Transcribe the audio
-                        text = self.transcribe_audio(audio_data)
-                        
-                        if text:
-                            # Send transcript via callback
-                            callback(text)
-                    
-                    # Increase delay to reduce processing load and file conflicts
-                    time.sleep(2.0)  # Increased from 0.5 to 2.0 seconds
-                    
+                    result = self.backend.transcribe(audio, **options)
                 except Exception as e:
-                    print(f"Transcription worker error: {e}")
-                    time.sleep(1)
+                    chunk_done(index, offset, None, e)
+                    continue
+                if key:
+                    self.cache.put(key, compact_result(result))
+                chunk_done(index, offset, result)
+                continue
+            
+            in_flight.append((index, offset, key, self.pool.submit(audio, options)))
+            while len(in_flight) >= max_in_flight or (in_flight and in_flight[0][3].ready()):
+                self._collect_chunk(in_flight.popleft(), chunk_done)
+        while in_flight:
+            self._collect_chunk(in_flight.popleft(), chunk_done)
         
-        # Start transcription thread
-        self.transcription_thread = threading.Thread(target=transcription_worker)
-        self.transcription_thread.daemon = True
-        self.transcription_thread.start()
+        segments = [segment for chunk_segments in results for segment in chunk_segments]
+        processing = time.monotonic() - started
+        print(f"✅ Transcribed {duration:.0f}s of audio in {processing:.1f}s "
+              f"({duration / processing:.1f}x real time, {len(chunks)} chunks)")
+        return {
+            'text': " ".join(segment['text'] for segment in segments),
+            'segments': segments,
+            'duration_seconds': round(duration, 2),
+            'processing_seconds': round(processing, 2),
+            'speed': round(duration / processing, 2) if processing else None,
+            'chunks': len(chunks),
+            'chunks_skipped': stats['skipped'],
+            'chunks_failed': stats['failed'],
+        }
+    
+    def _collect_chunk(self, job, chunk_done):
+        index, offset, key, async_result = job
+        try:
+            result = async_result.get()
+        except Exception as e:
+            chunk_done(index, offset, None, e)
+            return
+        if key:
+            self.cache.put(key, compact_result(result))
+        chunk_done(index, offset, result)
+    
+    def create_worker(self, audio_processor, callback, on_backpressure=None):
+        """Build a session's TranscriptionWorker (VAD, decoder, controller) without starting a thread"""
+        vad = VoiceActivityDetector(self.sample_rate, **self.vad_options) if self.vad_enabled else None
+        decoder = IncrementalDecoder() if self.incremental else None
+        controller = None
+        if self.rtf_control:
+            controller = RealTimeController(audio_processor, on_backpressure=on_backpressure,
+                                            greedy_options=self.greedy_options, **self.rtf_options)
+        worker = TranscriptionWorker(self, audio_processor, callback, vad, decoder, controller)
+        self.workers.add(worker)
+        self.worker = worker
+        return worker
+    
+    def start_continuous_transcription(self, audio_processor, callback, on_backpressure=None):
+        """Start continuous transcription in a separate thread"""
+        worker = self.create_worker(audio_processor, callback, on_backpressure)
+        worker.start()
         print("Continuous transcription started")
+        return worker
     
-    def stop_transcription(self):
-        """Stop the continuous transcription"""
-        self.running = False
-        if hasattr(self, 'transcription_thread'):
-            self.transcription_thread.join(timeout=2)
-        print("Transcription stopped")
+    def stop_transcription(self, worker=None, drain=True):
+        """Stop a session's continuous transcription (default: the most recent one).
+        
+        With ``drain`` this blocks until all buffered audio is transcribed and
+        its text delivered; without it (client gone) buffered audio is dropped.
+        """
+        worker = worker or self.worker
+        if worker:
+            worker.stop(drain=drain)
+            self.workers.discard(worker)
+            stats = worker.get_stats()
+            print(f"Transcription stopped after {stats['windows_transcribed']} windows "
+                  f"(mean latency {stats['mean_latency_seconds']}s)")
+            if stats['vad']:
+                print(f"VAD skipped {stats['vad']['model_invocations_saved']} of {stats['vad']['windows_seen']} windows")
+        else:
+            print("Transcription stopped")
+    
+    def get_stats(self, worker=None):
+        """Queue depth, latency and VAD statistics for a session (default: the most recent one)"""
+        worker = worker or self.worker
+        if not worker:
+            return None
+        stats = worker.get_stats()
+        if self.pool:
+            stats['pool'] = self.pool.get_stats()
+        if self.batcher:
+            stats['batching'] = self.batcher.get_stats()
+        if self.cache:
+            stats['cache'] = self.cache.get_stats()
+        return stats
+    
+    def shutdown(self):
+        """Stop transcription and release the worker pool"""
+        for worker in list(self.workers):
+            worker.stop()
+        self.workers.clear()
+        if self.batcher:
+            self.batcher.close()
+        if self.pool:
+            self.pool.close()
+        if self.cache:
+            self.cache.close()
+    
+    def get_vad_stats(self, worker=None):
+        """Speech/silence statistics for a session (None if VAD is off)"""
+        worker = worker or self.worker
+        if worker and worker.vad:
+            return worker.vad.get_stats()
+        return None
     
     def test_transcription(self, test_audio_path=None):
         """Test method to verify transcription is working"""
         try:
             if test_audio_path and os.path.exists(test_audio_path):
-                result = self.model.transcribe(test_audio_path)
+                result = (self.pool or self.backend).transcribe(test_audio_path)
                 print(f"Test transcription: {result['text']}")
                 return result['text']
             else:
@@ -150,3 +402,190 @@ class TranscriptionService:
         except Exception as e:
             print(f"Test transcription error: {e}")
             return None
+
+
+class TranscriptionWorker:
+    """Per-session transcription loop fed by an AudioProcessor.
+    
+    The worker sleeps on the processor's window condition and wakes as soon as
+    a full window is buffered. When audio has piled up it takes the queued
+    windows back to back instead of waiting between them. With a decoder,
+    overlapping windows are stitched so each word is emitted once.
+    """
+    
+    def __init__(self, service, audio_processor, callback, vad=None, decoder=None, controller=None):
+        self.service = service
+        self.audio_processor = audio_processor
+        self.callback = callback
+        self.vad = vad
+        self.decoder = decoder
+        self.controller = controller
+        self.running = False
+        self.drain_on_stop = True
+        self.thread = None
+        self.windows_taken = 0
+        self.windows_transcribed = 0
+        self.latencies = deque(maxlen=100)  # window ready -> transcript emitted, seconds
+    
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def stop(self, drain=True, timeout=2):
+        """Stop the worker thread; with ``drain`` wait (without timeout) until it has drained"""
+        self.drain_on_stop = drain
+        self.running = False
+        self.audio_processor.wake()
+        if self.thread:
+            self.thread.join(timeout=None if drain else timeout)
+    
+    def _run(self):
+        while self.running:
+            try:
+                window = self.audio_processor.next_window()
+                if window is None:
+                    # Block until the audio path signals a full window
+                    self.audio_processor.wait_for_window(timeout=1.0)
+                    continue
+                self.process_available(window)
+                
+            except Exception as e:
+                print(f"Transcription worker error: {e}")
+                time.sleep(1)
+        
+        if self.drain_on_stop:
+            self.drain()
+        else:
+            self.finish()
+    
+    def process_available(self, window):
+        """Transcribe a window, batching it with any windows queued behind it"""
+        batcher = self.service.batcher
+        if batcher and not self.decoder and self.audio_processor.pending_windows():
+            # Backlog: hand the queued windows to the batcher together
+            windows = [window]
+            while len(windows) < batcher.max_batch_size:
+                next_window = self.audio_processor.next_window()
+                if next_window is None:
+                    break
+                windows.append(next_window)
+            self.process_batch(windows)
+        else:
+            self.process_window(window)
+    
+    def drain(self):
+        """End of stream: transcribe the queued full windows, then the partial tail, then flush"""
+        while True:
+            window = self.audio_processor.next_window()
+            if window is None:
+                break
+            try:
+                self.process_available(window)
+            except Exception as e:
+                print(f"Transcription worker error: {e}")
+        tail = self.audio_processor.take_remaining()
+        if tail is not None:
+            try:
+                self.process_window(tail)
+            except Exception as e:
+                print(f"Transcription worker error: {e}")
+        self.finish()
+    
+    def finish(self):
+        """Words held back for agreement are final once the stream ends"""
+        if self.decoder:
+            self._emit(self.decoder.flush())
+    
+    def process_window(self, window):
+        """Gate, transcribe and emit one AudioWindow; returns the text (or None if skipped)"""
+        self.windows_taken += 1
+        audio = window.samples
+        offset = window.start_sample
+        
+        # Drop silent windows and trim silence before paying for Whisper
+        if self.vad:
+            speech = self.vad.gate(audio)
+            if speech is None:
+                WINDOWS_SKIPPED.inc()
+                if self.decoder:
+                    # Nothing will revise the pending words now
+                    self._emit(self.decoder.flush())
+                return None
+            audio = audio[speech[0]:speech[1]]
+            offset += speech[0]
+        
+        sample_rate = self.audio_processor.sample_rate
+        decode_options = self.controller.decode_options if self.controller else None
+        started = time.monotonic()
+        if self.decoder:
+            words = self.service.transcribe_words(audio, offset / sample_rate, self.decoder.prompt(),
+                                                  decode_options)
+            text = self.decoder.update(words, window.next_start_sample / sample_rate)
+        else:
+            text = self.service.transcribe_audio(audio, decode_options=decode_options)
+        inference_seconds = time.monotonic() - started
+        self._emit(text)
+        
+        self._window_done(window, inference_seconds)
+        return text
+    
+    def process_batch(self, windows):
+        """Gate several windows, decode the survivors as one batch and emit in order"""
+        jobs = []
+        for window in windows:
+            self.windows_taken += 1
+            audio = window.samples
+            if self.vad:
+                speech = self.vad.gate(audio)
+                if speech is None:
+                    WINDOWS_SKIPPED.inc()
+                    continue
+                audio = audio[speech[0]:speech[1]]
+            decode_options = self.controller.decode_options if self.controller else None
+            jobs.append((window, self.service.batcher.submit(audio, options=decode_options)))
+        
+        started = time.monotonic()
+        for window, job in jobs:
+            try:
+                self._emit(job.wait())
+            except Exception as e:
+                print(f"Transcription error: {e}")
+            # The batch shares one inference pass; charge each window an equal part
+            self._window_done(window, (time.monotonic() - started) / len(jobs))
+    
+    def _window_done(self, window, inference_seconds):
+        latency = time.monotonic() - window.ready_time
+        self.windows_transcribed += 1
+        self.latencies.append(latency)
+        sample_rate = self.audio_processor.sample_rate
+        WINDOWS_TRANSCRIBED.inc()
+        WHISPER_INFERENCE_SECONDS.observe(inference_seconds)
+        WHISPER_RTF.observe(inference_seconds / (len(window.samples) / sample_rate))
+        TRANSCRIPT_EMIT_SECONDS.observe(latency)
+        if self.controller:
+            self.controller.observe(
+                len(window.samples) / sample_rate,
+                (window.next_start_sample - window.start_sample) / sample_rate,
+                inference_seconds,
+                latency
+            )
+    
+    def _emit(self, text):
+        if text:
+            # Send transcript via callback
+            self.callback(text)
+    
+    def get_stats(self):
+        latencies = list(self.latencies)
+        return {
+            'windows_taken': self.windows_taken,
+            'windows_transcribed': self.windows_transcribed,
+            'queue_depth': self.audio_processor.pending_windows(),
+            'last_latency_seconds': round(latencies[-1], 3) if latencies else None,
+            'mean_latency_seconds': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'max_latency_seconds': round(max(latencies), 3) if latencies else None,
+            'vad': self.vad.get_stats() if self.vad else None,
+            'controller': self.controller.report() if self.controller else None,
+        }
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'transcription_cache.db')
+
+
+class TranscriptionCache:
+    """Disk-backed cache of Whisper results keyed by the audio content.
+
+    The key is a SHA-256 of the float32 samples, the model identity and the
+    decode options, so a replayed recording or a repeated window (hold music,
+    a recorded intro) returns the stored result without running the model.
+    Entries are evicted least-recently-used once the stored results exceed
+    ``max_bytes``.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=256 * 1024 * 1024, model_id=""):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS transcriptions (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON transcriptions (last_used)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM transcriptions').fetchone()[0]
+
+    def key(self, audio, options=None):
+        """Content hash of the samples, the model and the decode options"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        digest.update(self.model_id.encode('utf-8'))
+        # verbose only changes console output, not the result
+        options = {name: value for name, value in (options or {}).items() if name != 'verbose'}
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Stored result for the key, or None"""
+        with self._lock:
+            row = self.conn.execute('SELECT result FROM transcriptions WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute('UPDATE transcriptions SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Store a result, evicting the least recently used entries over the size limit"""
+        data = json.dumps(result, default=float)
+        with self._lock:
+            previous = self.conn.execute('SELECT size FROM transcriptions WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO transcriptions (key, result, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, data, len(data), time.time())
+            )
+            self.total_bytes += len(data) - (previous[0] if previous else 0)
+
+            while self.total_bytes > self.max_bytes:
+                oldest = self.conn.execute(
+                    'SELECT key, size FROM transcriptions ORDER BY last_used LIMIT 64').fetchall()
+                if not oldest:
+                    break
+                for old_key, size in oldest:
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    self.conn.execute('DELETE FROM transcriptions WHERE key = ?', (old_key,))
+                    self.total_bytes -= size
+                    self.evictions += 1
+            self.conn.commit()
+
+    def get_stats(self):
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM transcriptions').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'entries': entries,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def compact_result(result):
+    """The parts of a Whisper result the service reads (text, segment and word timings)"""
+    return {
+        'text': result.get('text', ''),
+        'segments': [
+            {
+                'start': segment['start'],
+                'end': segment['end'],
+                'text': segment['text'],
+                'words': [
+                    {'word': word['word'], 'start': word['start'], 'end': word['end']}
+                    for word in segment.get('words', [])
+                ],
+            }
+            for segment in result.get('segments', [])
+        ],
+    }
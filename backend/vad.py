@@ -0,0 +1,101 @@
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Cheap energy + spectral-flatness voice activity gate.
+
+    A frame counts as speech when its energy is well above the running noise
+    floor and its spectrum is peaky (low flatness) inside the speech band.
+    ``gate`` returns the sample range of a window that is worth sending to
+    Whisper, or None when the whole window is silence or steady noise.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_margin_db=10,
+                 min_energy_db=-55, max_threshold_db=-35, flatness_threshold=0.45,
+                 band_hz=(100, 4000), min_speech_seconds=0.25, padding_ms=300):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.energy_margin_db = energy_margin_db
+        self.min_energy_db = min_energy_db
+        self.max_threshold_db = max_threshold_db
+        self.flatness_threshold = flatness_threshold
+        self.min_speech_frames = max(1, int(min_speech_seconds * 1000 / frame_ms))
+        self.padding_frames = int(padding_ms / frame_ms)
+
+        freqs = np.fft.rfftfreq(self.frame_len, 1 / sample_rate)
+        self._band = (freqs >= band_hz[0]) & (freqs <= band_hz[1])
+        self._taper = np.hanning(self.frame_len).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget the noise floor and statistics (call at session start)"""
+        self.noise_floor_db = None
+        self.windows_seen = 0
+        self.windows_skipped = 0
+        self.windows_trimmed = 0
+        self.speech_samples = 0
+        self.silence_samples = 0
+
+    def speech_mask(self, audio):
+        """Per-frame speech decision for a float32 window"""
+        n_frames = len(audio) // self.frame_len
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool)
+        frames = audio[:n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+        self._update_noise_floor(energy_db)
+        threshold = np.clip(self.noise_floor_db + self.energy_margin_db,
+                            self.min_energy_db, self.max_threshold_db)
+        mask = energy_db > threshold
+
+        # Spectral check only on the frames that passed the energy test
+        if mask.any():
+            power = np.abs(np.fft.rfft(frames[mask] * self._taper, axis=1))[:, self._band] ** 2 + 1e-12
+            flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+            mask[mask] = flatness < self.flatness_threshold
+        return mask
+
+    def _update_noise_floor(self, energy_db):
+        # Quiet frames pull the floor down immediately; louder ones raise it slowly
+        estimate = np.percentile(energy_db, 10)
+        if self.noise_floor_db is None or estimate < self.noise_floor_db:
+            self.noise_floor_db = float(estimate)
+        else:
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * float(estimate)
+
+    def gate(self, audio):
+        """Return (start, end) sample indices of the speech region, or None to skip"""
+        self.windows_seen += 1
+        mask = self.speech_mask(audio)
+        speech_frames = np.flatnonzero(mask)
+
+        if len(speech_frames) < self.min_speech_frames:
+            self.windows_skipped += 1
+            self.silence_samples += len(audio)
+            return None
+
+        # Keep a little context around the detected speech
+        first = max(0, int(speech_frames[0]) - self.padding_frames)
+        last = int(speech_frames[-1]) + self.padding_frames + 1
+        start = first * self.frame_len
+        end = len(audio) if last >= len(mask) else last * self.frame_len
+
+        if start > 0 or end < len(audio):
+            self.windows_trimmed += 1
+        self.speech_samples += end - start
+        self.silence_samples += len(audio) - (end - start)
+        return start, end
+
+    def get_stats(self):
+        """Speech/silence statistics for the current session"""
+        total = self.speech_samples + self.silence_samples
+        return {
+            'windows_seen': self.windows_seen,
+            'windows_skipped': self.windows_skipped,
+            'windows_trimmed': self.windows_trimmed,
+            'model_invocations_saved': self.windows_skipped,
+            'speech_seconds': round(self.speech_samples / self.sample_rate, 2),
+            'silence_seconds': round(self.silence_samples / self.sample_rate, 2),
+            'speech_ratio': round(self.speech_samples / total, 3) if total else 0.0,
+        }
@@ -1,3 +1,4 @@
+import streamlit_ui  # first: puts the repository root on sys.path
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
@@ -14,21 +15,27 @@ from selenium.webdriver.support import expected_conditions as EC
 import sqlite3
 from datetime import datetime
 import schedule
-from openai import OpenAI
 import threading
 import os
 import streamlit as st
-import os
+from map_reduce import MapReduceAnalyzer
+from llm_client import get_client
+from shared.config import Config
+from streamlit_ui import stream_to, show_first_token, show_llm_latency
 # Removed redundant import as WebDataHarvester is already defined in this file
 
 class WebDataHarvester:
     def __init__(self):
-        # Initialize OpenAI client for insights
-        self.client = OpenAI(
-            api_key="8124c85892537a0bfcdae4b999e4eba2909c367431cab6a72589c2278e4c2cc4",
-            base_url="https://api.together.xyz/v1"
+        # Shared pooled, rate-limited client (one per endpoint for all sessions)
+        self.llm = get_client(Config.TOGETHER_API_KEY, Config.TOGETHER_BASE_URL, Config.TOGETHER_MODEL_NAME)
+        self.model_name = Config.TOGETHER_MODEL_NAME
+        # Whole-content analysis: chunks are condensed in parallel, then combined
+        self.analyzer = MapReduceAnalyzer(
+            self._complete,
+            chunk_tokens=Config.ANALYSIS_CHUNK_TOKENS,
+            max_workers=Config.ANALYSIS_MAX_CONCURRENCY,
+            stream=self._stream
         )
-        self.model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
 
         # Setup logging
         logging.basicConfig(
@@ -55,6 +62,14 @@ class WebDataHarvester:
         # Rate limiting
         self.request_delay = 2  # seconds between requests
 
+    def _complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """One chat completion with the configured model"""
+        return self.llm.complete(prompt, max_tokens, temperature, model=self.model_name)
+
+    def _stream(self, prompt: str, max_tokens: int, temperature: float):
+        """Streamed chat completion: yields text as it is generated"""
+        return self.llm.stream_complete(prompt, max_tokens, temperature, model=self.model_name)
+
     def init_database(self):
         """Initialize SQLite database for storing scraped data"""
         self.conn = sqlite3.connect('harvested_data.db', check_same_thread=False)
@@ -274,8 +289,8 @@ class WebDataHarvester:
             self.logger.error(f"Error storing data: {e}")
             return None
 
-    def generate_insights(self, data_id: int = None) -> str:
-        """Generate AI insights from scraped data"""
+    def generate_insights(self, data_id: int = None, on_delta=None) -> str:
+        """Generate AI insights from scraped data (streamed to on_delta if given)"""
         try:
             if data_id:
                 # Analyze specific data
@@ -297,15 +312,15 @@ class WebDataHarvester:
                 if not rows:
                     return "No data available for analysis"
 
-                content = "\n\n".join([f"Title: {row[0]}\nContent: {row[1][:500]}..." for row in rows])
+                content = "\n\n".join([f"Title: {row[0]}\nContent: {row[1]}" for row in rows])
                 title = "Recent scraped data"
 
-            prompt = f"""Analyze the following scraped web data and provide comprehensive insights:
+            prompt = """Analyze the following scraped web data and provide comprehensive insights:
 
 Title: {title}
 
 Content:
-{content[:4000]}
+{content}
 
 Please provide:
 1. Key themes and topics identified
@@ -316,14 +331,10 @@ Please provide:
 
 Insights:"""
 
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=1500
-            )
-
-            insights = response.choices[0].message.content.strip()
+            # Long content is analyzed chunk by chunk instead of being truncated
+            insights = self.analyzer.run(content, lambda text: prompt.format(title=title, content=text),
+                                         focus="themes, trends, facts and data quality",
+                                         max_tokens=1500, temperature=0.3, on_delta=on_delta)
 
             # Store insights
             if data_id:
@@ -517,7 +528,6 @@ def main():
     finally:
         harvester.close()
 
-
 def streamlit_app():
     st.set_page_config(page_title="🕸️ Web Data Harvester", page_icon="🌐")
 
@@ -529,6 +539,7 @@ def streamlit_app():
         st.session_state.harvester = WebDataHarvester()
 
     harvester = st.session_state.harvester
+    show_llm_latency(harvester.llm, harvester.model_name)
 
     # Sidebar for navigation
     st.sidebar.title("Navigation")
@@ -557,9 +568,12 @@ def streamlit_app():
                     st.subheader("Scraped Content")
                     st.write(data["content"][:1000] + "...")
                     if st.checkbox("Generate Insights now?"):
-                        insights = harvester.generate_insights(data_id)
                         st.subheader("📊 Insights")
-                        st.write(insights)
+                        placeholder = st.empty()
+                        on_delta = stream_to(placeholder)
+                        insights = harvester.generate_insights(data_id, on_delta=on_delta)
+                        placeholder.markdown(insights)
+                        show_first_token(on_delta)
                 else:
                     st.error("❌ Failed to scrape URL")
 
@@ -588,9 +602,12 @@ def streamlit_app():
         data_id = st.text_input("Enter data ID (optional)")
         if st.button("Generate Insights"):
             with st.spinner("Analyzing scraped data..."):
-                insights = harvester.generate_insights(int(data_id) if data_id else None)
                 st.subheader("📊 Insights")
-                st.write(insights)
+                placeholder = st.empty()
+                on_delta = stream_to(placeholder)
+                insights = harvester.generate_insights(int(data_id) if data_id else None, on_delta=on_delta)
+                placeholder.markdown(insights)
+                show_first_token(on_delta)
 
     elif option == "Export Data":
         format_type = st.selectbox("Select export format", ["csv", "excel", "json"])
@@ -0,0 +1,217 @@
+import sys
+import time
+import wave
+
+import numpy as np
+
+from batching import decode_batch
+
+
+class WhisperBackend:
+    """Interface every inference backend implements.
+
+    ``transcribe`` takes a float32 16 kHz array (or a file path) and returns a
+    Whisper-style dict: ``{'text': ..., 'segments': [{'start', 'end', 'text',
+    'words': [{'word', 'start', 'end'}]}]}``.
+    """
+
+    name = None
+    # Whether the loaded model can be shared with forked worker processes
+    fork_safe = True
+    # Decode options for plain greedy decoding without temperature fallback
+    greedy_options = {'temperature': 0.0}
+
+    # Used when no compute type is configured
+    default_compute_type = None
+
+    def __init__(self, model_name="base", compute_type=None, threads=0):
+        self.model_name = model_name
+        self.compute_type = self.resolve_compute_type(compute_type)
+        self.threads = threads
+
+    @classmethod
+    def resolve_compute_type(cls, compute_type=None):
+        """Compute type a model loaded with ``compute_type`` runs at (known without loading it)"""
+        return compute_type or cls.default_compute_type
+
+    def transcribe(self, audio, **options):
+        raise NotImplementedError
+
+    def decode_batch(self, arrays, **options):
+        """Text for several windows; backends without batching fall back to a loop"""
+        return [self.transcribe(audio, **options)["text"].strip() for audio in arrays]
+
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """Reference openai-whisper model on PyTorch (fp32 on CPU)"""
+
+    name = "openai"
+    # beam_size=1 would select the beam-search decoder with one beam; None is greedy
+    greedy_options = {'temperature': 0.0, 'beam_size': None, 'best_of': None}
+    default_compute_type = "float32"
+
+    def __init__(self, model_name="base", compute_type=None, threads=0):
+        super().__init__(model_name, compute_type, threads)
+        import torch
+        import whisper
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device="cpu")
+
+    def transcribe(self, audio, **options):
+        return self.model.transcribe(audio, **options)
+
+    def decode_batch(self, arrays, **options):
+        return decode_batch(self.model, arrays, **options)
+
+
+class QuantizedWhisperBackend(OpenAIWhisperBackend):
+    """openai-whisper with PyTorch dynamic int8 quantization of the Linear layers"""
+
+    name = "int8"
+
+    def __init__(self, model_name="base", compute_type=None, threads=0):
+        super().__init__(model_name, compute_type, threads)
+        import torch
+        import whisper
+
+        # whisper.model.Linear only adds a dtype cast for fp16; quantize_dynamic
+        # matches exact types, so present these layers as plain nn.Linear
+        for module in self.model.modules():
+            if isinstance(module, whisper.model.Linear):
+                module.__class__ = torch.nn.Linear
+
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    @classmethod
+    def resolve_compute_type(cls, compute_type=None):
+        return "int8"
+
+
+class FasterWhisperBackend(WhisperBackend):
+    """CTranslate2 model through faster-whisper (int8 by default on CPU)"""
+
+    name = "faster-whisper"
+    # CTranslate2 keeps its own thread pool, which does not survive fork
+    fork_safe = False
+    # faster-whisper searches 5 beams by default
+    greedy_options = {'temperature': 0.0, 'beam_size': 1}
+    default_compute_type = "int8"
+
+    # Options faster-whisper understands; the rest (fp16, verbose) are Whisper-only
+    SUPPORTED_OPTIONS = ("language", "task", "initial_prompt", "word_timestamps",
+                         "beam_size", "best_of", "temperature", "condition_on_previous_text")
+
+    def __init__(self, model_name="base", compute_type=None, threads=0):
+        super().__init__(model_name, compute_type, threads)
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_name, device="cpu", compute_type=self.compute_type,
+                                  cpu_threads=threads)
+
+    def transcribe(self, audio, **options):
+        options = {key: value for key, value in options.items() if key in self.SUPPORTED_OPTIONS}
+        segments, _ = self.model.transcribe(audio, **options)
+
+        result_segments = []
+        for segment in segments:
+            result_segments.append({
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "words": [
+                    {"word": word.word, "start": word.start, "end": word.end}
+                    for word in (segment.words or [])
+                ],
+            })
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+        }
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OpenAIWhisperBackend, QuantizedWhisperBackend, FasterWhisperBackend)
+}
+
+
+def backend_class(name="openai"):
+    """Backend class by name (see BACKENDS), without loading a model"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown Whisper backend '{name}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def load_backend(name="openai", model_name="base", compute_type=None, threads=0):
+    """Instantiate a backend by name (see BACKENDS)"""
+    cls = backend_class(name)
+    print(f"Loading Whisper model '{model_name}' with backend '{name}'...")
+    return cls(model_name, compute_type or None, threads)
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def read_wav(path):
+    """Load a 16-bit mono 16 kHz WAV as float32"""
+    with wave.open(path, 'rb') as wav_file:
+        if wav_file.getframerate() != 16000 or wav_file.getnchannels() != 1:
+            raise ValueError("parity audio must be 16 kHz mono")
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def parity(audio_path, reference=None, model_name="base", backends=None, max_wer_delta=0.05):
+    """Compare backends on WER and real-time factor against the fp32 reference.
+
+    Without a reference transcript, the fp32 backend's output is used as the
+    reference. A backend passes when its WER is within ``max_wer_delta`` of the
+    fp32 WER.
+    """
+    audio = read_wav(audio_path)
+    duration = len(audio) / 16000
+    results = {}
+
+    for name in backends or list(BACKENDS):
+        try:
+            backend = load_backend(name, model_name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        backend.transcribe(audio[:16000], language="en", fp16=False)  # warm-up
+        start = time.perf_counter()
+        text = backend.transcribe(audio, language="en", fp16=False)["text"].strip()
+        results[name] = {'text': text, 'rtf': (time.perf_counter() - start) / duration}
+
+    if reference is None and "openai" in results:
+        reference = results["openai"]["text"]
+    baseline_wer = word_error_rate(reference, results["openai"]["text"]) if "openai" in results else 0.0
+
+    for name, result in results.items():
+        result['wer'] = word_error_rate(reference, result['text'])
+        result['passed'] = result['wer'] - baseline_wer <= max_wer_delta
+    return results
+
+
+if __name__ == '__main__':
+    # python whisper_backends.py speech.wav ["reference transcript"] [model_name]
+    if len(sys.argv) < 2:
+        print("usage: python whisper_backends.py speech.wav [reference] [model_name]")
+        sys.exit(2)
+    args = sys.argv[1:]
+    report = parity(args[0], args[1] if len(args) > 1 else None, args[2] if len(args) > 2 else "base")
+    for name, result in report.items():
+        status = "PASS" if result['passed'] else "FAIL"
+        print(f"{name:15s} WER {result['wer']:.3f}  RTF {result['rtf']:.3f}  {status}")
+    sys.exit(0 if all(result['passed'] for result in report.values()) else 1)
@@ -0,0 +1,95 @@
+import multiprocessing as mp
+import os
+import threading
+
+# Model used inside worker processes. The parent sets it before the pool forks,
+# so every worker shares the weights copy-on-write instead of loading its own.
+_model = None
+
+
+def _init_worker(threads, model_loader):
+    global _model
+    if _model is None and model_loader is not None:
+        # Fork unavailable or unsafe for this model: each worker loads its own copy
+        _model = model_loader(threads=threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def can_fork(backend):
+    """Whether workers for this backend (class or instance) fork from a parent holding the model"""
+    return getattr(backend, 'fork_safe', True) and 'fork' in mp.get_all_start_methods()
+
+
+def _run_job(method, audio, options):
+    return getattr(_model, method)(audio, **options)
+
+
+class WhisperWorkerPool:
+    """Pool of processes running Whisper inference off the Socket.IO process.
+
+    Jobs go through the pool's task queue; results come back through
+    ``submit`` callbacks or ``AsyncResult.get()``, so each session's worker
+    receives only its own windows. Create the pool at startup, before the
+    server starts threads and before the parent runs any inference, so the
+    fork is clean. When the workers are spawned instead (see ``can_fork``),
+    ``model`` may be None: each worker loads its own copy with ``model_loader``
+    and the parent does not need one.
+    """
+
+    def __init__(self, model, processes, threads_per_worker=0, model_loader=None):
+        global _model
+        self.processes = processes
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // processes)
+
+        if model is not None and can_fork(model):
+            _model = model
+            context = mp.get_context('fork')
+            initargs = (threads, None)
+        else:
+            context = mp.get_context('spawn')
+            initargs = (threads, model_loader)
+
+        self.pool = context.Pool(processes, initializer=_init_worker, initargs=initargs)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        print(f"Whisper worker pool started: {processes} processes x {threads} threads")
+
+    def submit(self, audio, options=None, callback=None, error_callback=None, method='transcribe'):
+        """Queue one job; returns a multiprocessing AsyncResult"""
+        with self._lock:
+            self.in_flight += 1
+
+        def on_done(result):
+            self._job_finished()
+            if callback:
+                callback(result)
+
+        def on_error(error):
+            self._job_finished()
+            if error_callback:
+                error_callback(error)
+
+        return self.pool.apply_async(_run_job, (method, audio, options or {}),
+                                     callback=on_done, error_callback=on_error)
+
+    def transcribe(self, audio, **options):
+        """Run the backend's transcribe in a worker and wait for the result"""
+        return self.submit(audio, options).get()
+
+    def _job_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {'processes': self.processes, 'in_flight': self.in_flight, 'completed': self.completed}
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
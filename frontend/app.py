@@ -140,9 +140,11 @@ class SystemAudioRecorder:
         while self.recording:
             try:
                 if not self.audio_queue.empty():
-                    audio_data = self.audio_queue.get()
-                    audio_bytes = audio_data.tobytes()
-                    ws_client.send_audio_data(audio_bytes)
+                    # Coalesce whatever is queued (up to the configured limit) into one frame
+                    blocks = [self.audio_queue.get()]
+                    while len(blocks) < Config.AUDIO_COALESCE_BLOCKS and not self.audio_queue.empty():
+                        blocks.append(self.audio_queue.get())
+                    ws_client.send_audio_blocks(blocks)
                 
                 time.sleep(0.01)
                 
@@ -247,6 +249,11 @@ if st.session_state.connection_status == "Connected":
         print(f"✅ Updated insights in session state")
         st.rerun()
 
+    # Server could not keep up and dropped audio
+    if st.session_state.session_active and st.session_state.ws_client.backpressure:
+        notice = st.session_state.ws_client.backpressure
+        st.warning(f"⚠️ {notice.get('message')} - {notice.get('dropped_seconds')}s of audio skipped")
+
 # Session Summary (appears after recording stops)
 if not st.session_state.session_active and st.session_state.transcript_parts:
     st.markdown("---")
@@ -323,6 +330,25 @@ with col2:
                         st.markdown(f"**{i}.** {insight}")
             else:
                 st.info("No insights were generated from this session")
+            if st.session_state.ws_client.first_token_seconds is not None:
+                st.caption(f"First insight token after {st.session_state.ws_client.first_token_seconds:.2f}s")
+                
+        elif st.session_state.ws_client.insights_pending:
+            # Render the insight tokens streamed so far; each run polls briefly and reruns,
+            # so the page stays responsive until the final result lands (or the client
+            # re-fetches the job after a dropped connection)
+            ws_client = st.session_state.ws_client
+            streamed = "".join(ws_client.insights_stream)
+            stage = (ws_client.insights_progress or {}).get('stage')
+            status = f"🧠 Generating insights ({stage})..." if stage else "🧠 Generating insights..."
+            st.markdown(f"🧠 {streamed}▌" if streamed else status)
+            if time.monotonic() - ws_client.insights_requested_at < 120:
+                time.sleep(0.5)
+                st.rerun()
+            else:
+                # Stop auto-refreshing; the job keeps running on the server
+                st.warning("⏳ Insights are still being generated. Check again in a moment.")
+                st.button("🔄 Check again")
                 
         else:
             if st.session_state.session_active:
@@ -12,8 +12,10 @@ import base64
 import numpy as np
 import streamlit as st
 from shared.config import Config
+from shared.audio_protocol import BINARY_TRANSPORT, JSON_TRANSPORT, SEQ_MODULO, encode_frame
 import threading
 import queue
+import time
 
 class WebSocketClient:
     def __init__(self):
@@ -21,6 +23,18 @@ class WebSocketClient:
         self.connected = False
         self.transcript_queue = queue.Queue()  # Thread-safe queue
         self.insights_queue = queue.Queue()   # Thread-safe queue
+        self.transport = JSON_TRANSPORT       # Until the server agrees to binary frames
+        self.backpressure = None              # Last backpressure notice from the server
+        self.session_error = None             # e.g. server at its session cap
+        self.batch_progress = None            # Last progress report of an offline transcription
+        self.insights_stream = []             # Final-insight tokens streamed so far
+        self.insights_pending = False         # Waiting for final insights after stop
+        self.insights_requested_at = None
+        self.insights_job_id = None           # Background insight job for the last stopped session
+        self.insights_progress = None         # Last insights_progress event (status, stage)
+        self.search_results = None            # Last archive search response
+        self.first_token_seconds = None       # Time to first streamed insight token
+        self.seq = 0
         self.setup_handlers()
     
     def setup_handlers(self):
@@ -29,21 +43,47 @@ class WebSocketClient:
         @self.sio.event
         def connect():
             self.connected = True
+            self.transport = JSON_TRANSPORT
+            self.seq = 0
             print("🔗 WebSocket connected successfully")
+            if self.insights_pending and self.insights_job_id:
+                # Reconnected while insights were being generated: pick the job up again
+                self.sio.emit('get_insights_job', {'job_id': self.insights_job_id})
+            if Config.AUDIO_TRANSPORT == 'binary':
+                # Older servers ignore this and we stay on the JSON path
+                self.sio.emit('negotiate_transport', {'transports': [BINARY_TRANSPORT, JSON_TRANSPORT]})
         
         @self.sio.event
         def disconnect():
             self.connected = False
             print("❌ WebSocket disconnected")
         
+        @self.sio.event
+        def transport_selected(data):
+            self.transport = data.get('transport', JSON_TRANSPORT)
+            print(f"🔀 Audio transport: {self.transport}")
+        
         @self.sio.event
         def session_started(data):
             print("✅ Session started")
         
         @self.sio.event
         def session_stopped(data):
+            # Insights follow from a background job; servers without jobs are already done
+            self.insights_job_id = data.get('job_id')
+            if not self.insights_job_id:
+                self.insights_pending = False
             print("⏹️ Session stopped")
         
+        @self.sio.event
+        def insights_progress(data):
+            if data.get('job_id') != self.insights_job_id:
+                return
+            self.insights_progress = data
+            print(f"🧠 Insight job {data['job_id'][:8]}: {data.get('stage', data['status'])}")
+            if data['status'] in ('done', 'failed', 'unknown'):
+                self.insights_pending = False
+        
         @self.sio.event
         def new_transcript(data):
             print(f"📝 Received transcript: {data['text'][:50]}...")
@@ -59,8 +99,18 @@ class WebSocketClient:
             # Put data in thread-safe queue (though not used in end-only approach)
             self.insights_queue.put(data)
 
+        @self.sio.event
+        def final_insights_delta(data):
+            if data.get('job_id', self.insights_job_id) != self.insights_job_id:
+                return
+            if not self.insights_stream and self.insights_requested_at:
+                self.first_token_seconds = time.monotonic() - self.insights_requested_at
+                print(f"⚡ First insight token after {self.first_token_seconds:.2f}s")
+            self.insights_stream.append(data.get('delta', ''))
+
         @self.sio.event
         def final_insights(data):
+            self.insights_pending = False
             print(f"🎯 Received final insights: {len(data.get('insights', []))} insights")
             # Put final insights in queue
             self.insights_queue.put(data)
@@ -70,6 +120,36 @@ class WebSocketClient:
             # Audio chunk received successfully
             pass
         
+        @self.sio.event
+        def backpressure(data):
+            print(f"⚠️ Server backpressure: {data.get('message')} ({data.get('dropped_seconds')}s dropped)")
+            self.backpressure = data
+        
+        @self.sio.event
+        def batch_progress(data):
+            print(f"⏩ {data['path']}: {data['chunks_done']}/{data['chunks_total']} chunks ({data['speed']}x real time)")
+            self.batch_progress = data
+        
+        @self.sio.event
+        def batch_transcript(data):
+            print(f"📄 Transcribed {data['path']}: {len(data['segments'])} segments")
+            for segment in data['segments']:
+                self.transcript_queue.put({'text': segment['text'], 'timestamp': f"{segment['start']:.0f}s"})
+        
+        @self.sio.event
+        def batch_error(data):
+            print(f"Offline transcription error: {data.get('error', 'Unknown error')}")
+        
+        @self.sio.event
+        def search_results(data):
+            print(f"🔎 {data.get('total', 0)} sessions match '{data.get('query', '')}'")
+            self.search_results = data
+        
+        @self.sio.event
+        def session_error(data):
+            print(f"❌ Session error: {data.get('error', 'Unknown error')}")
+            self.session_error = data.get('error')
+        
         @self.sio.event
         def audio_error(data):
             print(f"Audio error: {data.get('error', 'Unknown error')}")
@@ -110,19 +190,51 @@ class WebSocketClient:
     def start_session(self):
         """Start a new transcription session"""
         if self.connected:
+            self.backpressure = None
+            self.session_error = None
             self.sio.emit('start_session')
     
     def stop_session(self):
         """Stop the current session"""
         if self.connected:
+            self.insights_stream = []
+            self.insights_pending = True
+            self.insights_requested_at = time.monotonic()
+            self.first_token_seconds = None
+            self.insights_job_id = None
+            self.insights_progress = None
             self.sio.emit('stop_session')
     
+    def transcribe_file(self, path):
+        """Ask the server to transcribe a recording from its BATCH_AUDIO_DIR"""
+        if self.connected:
+            self.batch_progress = None
+            self.sio.emit('transcribe_file', {'path': path})
+    
+    def search_sessions(self, query, start=None, end=None, limit=20):
+        """Full-text search over saved sessions; the response lands in search_results"""
+        if self.connected:
+            self.search_results = None
+            self.sio.emit('search_sessions', {'q': query, 'start': start, 'end': end, 'limit': limit})
+    
     def send_audio_data(self, audio_data):
         """Send audio data to the server"""
         if self.connected:
             # Convert audio to base64
             audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             self.sio.emit('audio_data', {'audio': audio_base64})
+    
+    def send_audio_blocks(self, blocks):
+        """Send consecutive int16 blocks, coalesced into one binary frame when negotiated"""
+        if not self.connected or not blocks:
+            return
+        if self.transport == BINARY_TRANSPORT:
+            frame = encode_frame(blocks, self.seq, Config.AUDIO_SAMPLE_RATE)
+            self.sio.emit('audio_frame', frame)
+            self.seq = (self.seq + len(blocks)) % SEQ_MODULO
+        else:
+            for block in blocks:
+                self.send_audio_data(block.tobytes())
 
 def audio_to_bytes(audio_array, sample_rate=16000):
     """Convert audio array to bytes"""
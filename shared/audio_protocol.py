@@ -0,0 +1,79 @@
+"""Binary audio frame format shared by the frontend client and the backend.
+
+Frame layout (little-endian):
+
+    magic        4s   b'CIAF'
+    version      B    PROTOCOL_VERSION
+    dtype        B    1 = int16, 2 = float32
+    n_blocks     H    number of coalesced blocks in this frame
+    sample_rate  I    samples per second
+    seq          I    sequence number of the first block (wraps at 2**32)
+    lengths      n_blocks x I   samples in each block
+    payload      concatenated raw samples
+"""
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+PROTOCOL_VERSION = 1
+BINARY_TRANSPORT = 'binary-v1'
+JSON_TRANSPORT = 'json'
+
+MAGIC = b'CIAF'
+HEADER = struct.Struct('<4sBBHII')
+SEQ_MODULO = 2 ** 32
+
+DTYPE_CODES = {
+    np.dtype(np.int16): 1,
+    np.dtype(np.float32): 2,
+}
+CODE_DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+
+AudioFrame = namedtuple('AudioFrame', ['seq', 'sample_rate', 'dtype', 'blocks'])
+
+
+class FrameError(ValueError):
+    """Raised when a binary audio frame is malformed"""
+
+
+def encode_frame(blocks, seq, sample_rate):
+    """Pack one or more consecutive sample blocks into a single binary frame"""
+    if not blocks:
+        raise FrameError("frame needs at least one block")
+    dtype = np.asarray(blocks[0]).dtype
+    if dtype not in DTYPE_CODES:
+        raise FrameError(f"unsupported dtype: {dtype}")
+
+    arrays = [np.ascontiguousarray(b, dtype=dtype) for b in blocks]
+    header = HEADER.pack(MAGIC, PROTOCOL_VERSION, DTYPE_CODES[dtype], len(arrays),
+                         sample_rate, seq % SEQ_MODULO)
+    lengths = struct.pack(f'<{len(arrays)}I', *(len(a) for a in arrays))
+    return b''.join([header, lengths] + [a.tobytes() for a in arrays])
+
+
+def decode_frame(data):
+    """Unpack a binary frame into an AudioFrame whose blocks are zero-copy views"""
+    if len(data) < HEADER.size:
+        raise FrameError("frame shorter than header")
+    magic, version, dtype_code, n_blocks, sample_rate, seq = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise FrameError("bad magic")
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"unsupported protocol version: {version}")
+    if dtype_code not in CODE_DTYPES:
+        raise FrameError(f"unknown dtype code: {dtype_code}")
+
+    dtype = CODE_DTYPES[dtype_code]
+    offset = HEADER.size
+    lengths = struct.unpack_from(f'<{n_blocks}I', data, offset)
+    offset += 4 * n_blocks
+
+    if len(data) - offset != sum(lengths) * dtype.itemsize:
+        raise FrameError("payload size does not match block lengths")
+
+    blocks = []
+    for length in lengths:
+        blocks.append(np.frombuffer(data, dtype=dtype, count=length, offset=offset))
+        offset += length * dtype.itemsize
+    return AudioFrame(seq, sample_rate, dtype, blocks)
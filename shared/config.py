@@ -9,21 +9,107 @@ class Config:
     API_KEY = os.getenv('API_KEY', 'your-groq-api-key')
     MODEL_NAME = os.getenv('MODEL_NAME', 'llama-3.1-8b-instant')
     
+    # Together API Configuration (Chaos and Web harvesters); the key must come from the environment
+    TOGETHER_API_KEY = os.getenv('TOGETHER_API_KEY')
+    TOGETHER_BASE_URL = os.getenv('TOGETHER_BASE_URL', 'https://api.together.xyz/v1')
+    TOGETHER_MODEL_NAME = os.getenv('TOGETHER_MODEL_NAME', 'meta-llama/Llama-3.3-70B-Instruct-Turbo')
+    
+    # Shared LLM Client (per endpoint; 0 disables a limit)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 60))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 100000))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 4))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 60))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    # Response cache (exact prompt match, plus near-duplicate questions per document)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL_HOURS = float(os.getenv('LLM_CACHE_TTL_HOURS', 168))
+    LLM_CACHE_MB = float(os.getenv('LLM_CACHE_MB', 64))
+    # Near-duplicate question matching; off by default (0 = exact matches only), see LLMCache
+    LLM_CACHE_SIMILARITY = float(os.getenv('LLM_CACHE_SIMILARITY', 0))
+    
     # Flask Configuration
     FLASK_HOST = os.getenv('FLASK_HOST', 'localhost')
     FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
     
+    # Asyncio server (backend/asgi_app.py); same host/port settings as Flask
+    ASYNC_INGEST_THREADS = int(os.getenv('ASYNC_INGEST_THREADS', 4))  # audio filtering/buffering
+    ASYNC_INFERENCE_THREADS = int(os.getenv('ASYNC_INFERENCE_THREADS', 0))  # 0 = 2 per Whisper worker (min 2)
+    ASYNC_INGEST_QUEUE_FRAMES = int(os.getenv('ASYNC_INGEST_QUEUE_FRAMES', 64))  # per session, oldest dropped
+    
     # Audio Configuration
     AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', 16000))
     AUDIO_CHUNK_SIZE = int(os.getenv('AUDIO_CHUNK_SIZE', 1024))
     AUDIO_CHANNELS = 1
     AUDIO_FORMAT = 16
     
+    # Audio Buffer Configuration
+    AUDIO_BUFFER_SECONDS = float(os.getenv('AUDIO_BUFFER_SECONDS', 60))  # hard memory cap
+    TRANSCRIPTION_WINDOW_SECONDS = float(os.getenv('TRANSCRIPTION_WINDOW_SECONDS', 5))
+    TRANSCRIPTION_OVERLAP = float(os.getenv('TRANSCRIPTION_OVERLAP', 0.5))  # fraction of window
+    # Emit each word once across overlapping windows (word timestamps + local agreement)
+    TRANSCRIPTION_INCREMENTAL = os.getenv('TRANSCRIPTION_INCREMENTAL', 'true').lower() == 'true'
+    
+    # Whisper Inference (0 workers = run in the server process)
+    WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'openai')  # 'openai', 'int8' or 'faster-whisper'
+    WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+    WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', '')  # backend default if empty
+    # Startup calibration: pick the largest candidate meeting the target RTF with headroom
+    WHISPER_AUTOTUNE = os.getenv('WHISPER_AUTOTUNE', 'false').lower() == 'true'
+    WHISPER_CANDIDATE_MODELS = os.getenv('WHISPER_CANDIDATE_MODELS', 'tiny,base,small,medium').split(',')
+    WHISPER_TARGET_RTF = float(os.getenv('WHISPER_TARGET_RTF', 0.5))
+    WHISPER_RTF_HEADROOM = float(os.getenv('WHISPER_RTF_HEADROOM', 0.25))
+    WHISPER_WORKERS = int(os.getenv('WHISPER_WORKERS', 0))
+    WHISPER_THREADS_PER_WORKER = int(os.getenv('WHISPER_THREADS_PER_WORKER', 0))  # 0 = cores / workers
+    # >1 batches concurrent windows. Off by default: it is not shown to beat serial
+    # decoding on CPU; enable it only where `python backend/batching.py speech.wav` says so
+    WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', 1))
+    WHISPER_BATCH_WAIT_MS = int(os.getenv('WHISPER_BATCH_WAIT_MS', 50))
+    
+    # Transcription Cache (content-addressed, LRU-evicted past the size limit)
+    TRANSCRIPTION_CACHE_ENABLED = os.getenv('TRANSCRIPTION_CACHE_ENABLED', 'true').lower() == 'true'
+    TRANSCRIPTION_CACHE_MB = float(os.getenv('TRANSCRIPTION_CACHE_MB', 256))
+    
+    # Real-Time Control (adapts window/overlap/decoding, drops audio past the backlog cap)
+    RTF_CONTROL_ENABLED = os.getenv('RTF_CONTROL_ENABLED', 'true').lower() == 'true'
+    TRANSCRIPT_LATENCY_SLO_SECONDS = float(os.getenv('TRANSCRIPT_LATENCY_SLO_SECONDS', 10))
+    MAX_AUDIO_BACKLOG_SECONDS = float(os.getenv('MAX_AUDIO_BACKLOG_SECONDS', 30))
+    
+    # Audio Filter Chain (0 disables a stage)
+    AUDIO_LOWPASS_HZ = float(os.getenv('AUDIO_LOWPASS_HZ', 4000))
+    AUDIO_HIGHPASS_HZ = float(os.getenv('AUDIO_HIGHPASS_HZ', 0))
+    AUDIO_GAIN_DB = float(os.getenv('AUDIO_GAIN_DB', 0))
+    
+    # Voice Activity Detection (skips silent windows before Whisper)
+    VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() == 'true'
+    VAD_ENERGY_MARGIN_DB = float(os.getenv('VAD_ENERGY_MARGIN_DB', 10))
+    VAD_MIN_SPEECH_SECONDS = float(os.getenv('VAD_MIN_SPEECH_SECONDS', 0.25))
+    
     # WebSocket Configuration
     WEBSOCKET_URL = os.getenv('WEBSOCKET_URL', 'ws://localhost:5000')
+    AUDIO_TRANSPORT = os.getenv('AUDIO_TRANSPORT', 'binary')  # 'binary' or 'json'
+    AUDIO_COALESCE_BLOCKS = int(os.getenv('AUDIO_COALESCE_BLOCKS', 1))  # blocks per frame
+    
+    # Rolling Insights (summarize the transcript in chunks while recording, merge at stop)
+    INSIGHTS_ROLLING = os.getenv('INSIGHTS_ROLLING', 'true').lower() == 'true'
+    INSIGHTS_SUMMARY_EVERY_SEGMENTS = int(os.getenv('INSIGHTS_SUMMARY_EVERY_SEGMENTS', 20))
+    INSIGHTS_SUMMARY_EVERY_TOKENS = int(os.getenv('INSIGHTS_SUMMARY_EVERY_TOKENS', 1500))
+    INSIGHTS_MAX_PARTIALS = int(os.getenv('INSIGHTS_MAX_PARTIALS', 8))  # older partials are merged
+    
+    # Long-Content Analysis (harvesters split documents and analyze chunks in parallel)
+    ANALYSIS_CHUNK_TOKENS = int(os.getenv('ANALYSIS_CHUNK_TOKENS', 3000))
+    ANALYSIS_MAX_CONCURRENCY = int(os.getenv('ANALYSIS_MAX_CONCURRENCY', 4))
     
     # Session Configuration
     SESSION_DATA_PATH = 'data/sessions'
+    MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 8))  # concurrently recording clients
+    # Live sessions are journaled to backend/data/journal/*.jsonl (recovered on startup)
+    SESSION_JOURNAL_FSYNC_SECONDS = float(os.getenv('SESSION_JOURNAL_FSYNC_SECONDS', 1.0))  # max data lost in a crash
+    SESSION_JOURNAL_FSYNC_RECORDS = int(os.getenv('SESSION_JOURNAL_FSYNC_RECORDS', 64))  # sync sooner under bursts
+    # Final insights run as background jobs after stop; finished jobs stay fetchable by id
+    INSIGHT_JOB_WORKERS = int(os.getenv('INSIGHT_JOB_WORKERS', 4))
+    INSIGHT_JOBS_KEPT = int(os.getenv('INSIGHT_JOBS_KEPT', 200))
+    # Offline transcription: recordings the 'transcribe_file' event may read
+    BATCH_AUDIO_DIR = os.getenv('BATCH_AUDIO_DIR', 'data/recordings')  # relative to backend/
     
     # Insights Prompts
     INSIGHTS_PROMPT = """